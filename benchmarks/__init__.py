@@ -0,0 +1 @@
+""" Synthetic benchmarks of the rule engine, run with "python -m benchmarks.run". """
@@ -0,0 +1,105 @@
+import random
+from typing import Any, Dict, List
+
+KEYS = ['name', 'email', 'label', 'number', 'type', 'title', 'price', 'status']
+ACTIONS = ['', '|replace', '|unique', '|replace|unique']
+
+
+def wide_dict(width: int, seed: int = 0) -> Dict[str, Any]:
+    """ One level object with width scalar keys. """
+    rng = random.Random(seed)
+    return {f"key{i}": rng.choice([rng.randint(0, 1000), f"value{i}", True, None]) for i in range(width)}
+
+
+def deep_nesting(depth: int, fanout: int = 2, seed: int = 0) -> Dict[str, Any]:
+    """ Object nested depth levels with fanout keys per level, fanout ** depth leaves. """
+    rng = random.Random(seed)
+
+    def build(level: int) -> Any:
+        if level == depth:
+            return rng.randint(0, 1000)
+        return {f"level{level}_{i}": build(level + 1) for i in range(fanout)}
+
+    return build(0)
+
+
+def long_array(length: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """ Array of small records, like a bulk import. """
+    rng = random.Random(seed)
+    return [
+        {"id": i, "label": f"item {i}", "price": rng.randint(1, 100), "tags": [f"tag{rng.randint(0, 50)}" for _ in range(3)]}
+        for i in range(length)
+    ]
+
+
+def user_document(contacts: int, seed: int = 0) -> Dict[str, Any]:
+    """ The README user profile, with contacts entries. """
+    rng = random.Random(seed)
+    return {
+        "user": {
+            "name": "John Doe",
+            "email": "john@example.com",
+            "permissions": {"edit": True, "delete": False},
+            "contacts": [
+                {"type": rng.choice(["home", "work"]), "number": str(rng.randint(10 ** 9, 10 ** 10)), "label": f"Phone {i}"}
+                for i in range(contacts)
+            ],
+            "tags": [f"tag{rng.randint(0, 20)}" for _ in range(contacts)],
+        }
+    }
+
+
+def literal_rules(count: int, seed: int = 0) -> List[str]:
+    """ Rules over literal paths that mostly don't match the generated documents. """
+    rng = random.Random(seed)
+    return [f"section{i}.{rng.choice(KEYS)}.{rng.choice(KEYS)}" for i in range(count)]
+
+
+def wildcard_rules(count: int, seed: int = 0) -> List[str]:
+    """ Rules mixing "{*}", "[*]" and literal indices. """
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        shape = rng.choice([
+            "section{i}.{{*}}.{key}",
+            "section{i}[*].{key}",
+            "section{i}[{index}].{key}",
+            "section{i}.{{*}}[*].{key}",
+        ])
+        rules.append(shape.format(i=i, key=rng.choice(KEYS), index=rng.randint(0, 9)))
+    return rules
+
+
+def deny_rules(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [f"!section{i}.{rng.choice(KEYS)}" for i in range(count)]
+
+
+def action_rules(count: int, seed: int = 0) -> List[str]:
+    """ Rules with replace, unique and add actions. """
+    rng = random.Random(seed)
+    return [f"section{i}.{rng.choice(KEYS)}{rng.choice(ACTIONS + ['|add', '|add|unique'])}" for i in range(count)]
+
+
+def user_rules() -> List[str]:
+    """ Rules deciding every path of user_document. """
+    return [
+        "!user.permissions",
+        "user.name",
+        "user.email",
+        "user.contacts[*].label",
+        "user.contacts[0].number",
+        "user.tags[*]|unique",
+    ]
+
+
+def mixed_rules(count: int, seed: int = 0) -> List[str]:
+    """ count rules of every kind, followed by the rules matching user_document. """
+    per_kind = max(count // 4, 1)
+    rules = (
+        literal_rules(per_kind, seed)
+        + wildcard_rules(per_kind, seed)
+        + deny_rules(per_kind, seed)
+        + action_rules(per_kind, seed)
+    )
+    return rules[:count] + user_rules()
@@ -0,0 +1,204 @@
+"""
+Times the rule engine on synthetic documents and rule sets.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --compare results.json
+
+Results are written as JSON, so runs of different commits can be compared.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from json_patch_rules import patch_rules
+from benchmarks import generators
+
+FORMAT_VERSION = 1
+
+
+@dataclass
+class Case:
+    group: str
+    name: str
+    params: Dict[str, Any]
+    # builds the data outside of the timed code and returns the function to time
+    setup: Callable[[], Callable[[], Any]]
+
+
+@dataclass
+class Timing:
+    group: str
+    name: str
+    params: Dict[str, Any]
+    number: int
+    repeat: int
+    best: float
+    median: float
+
+
+def init_cases(rule_counts: Iterable[int]) -> List[Case]:
+    cases = []
+    for count in rule_counts:
+        rules = generators.mixed_rules(count)
+        cases.append(Case('init', f'rules={count}', {'rules': count}, lambda rules=rules: lambda: patch_rules(rules)))
+    return cases
+
+
+def verify_permission_cases(rule_counts: Iterable[int]) -> List[Case]:
+    paths = ['user.name', 'user.contacts[3].label', 'user.permissions.delete', 'section1.name.email', 'missing.path[0].key']
+
+    def setup(count: int) -> Callable[[], Any]:
+        patch = patch_rules(generators.mixed_rules(count), cache_size=0)
+        new_data = {'user': {}}
+        return lambda: [patch.verify_permission(path, new_data) for path in paths]
+
+    return [Case('verify_permission', f'rules={count}', {'rules': count, 'paths': len(paths)}, lambda count=count: setup(count)) for count in rule_counts]
+
+
+def get_paths_cases(sizes: Iterable[int]) -> List[Case]:
+    cases = []
+    patch = patch_rules([])
+    for size in sizes:
+        documents = {
+            'wide': generators.wide_dict(size),
+            'deep': generators.deep_nesting(max(size.bit_length() - 1, 1)),
+            'array': generators.long_array(size // 4),
+        }
+        for shape, document in documents.items():
+            cases.append(Case(
+                'get_paths', f'{shape} size={size}', {'shape': shape, 'size': size},
+                lambda document=document: lambda: sum(1 for _ in patch.get_paths(document)),
+            ))
+    return cases
+
+
+def apply_cases(sizes: Iterable[int], rule_counts: Iterable[int]) -> List[Case]:
+    actions = {
+        'set': ['{*}', '[*]'],
+        'replace': ['{*}|replace', '[*]|replace'],
+        'unique': ['[*]|unique'],
+        'deny': ['!{*}'],
+    }
+    cases = []
+    for size in sizes:
+        for count in rule_counts:
+            def setup(size: int = size, count: int = count) -> Callable[[], Any]:
+                patch = patch_rules(generators.mixed_rules(count))
+                old_data = generators.user_document(size, seed=1)
+                new_data = generators.user_document(size, seed=2)
+                return lambda: patch.apply(old_data, new_data)
+
+            cases.append(Case('apply', f'user contacts={size} rules={count}', {'shape': 'user', 'size': size, 'rules': count}, setup))
+
+        for action, rules in actions.items():
+            def setup(size: int = size, rules: List[str] = rules, action: str = action) -> Callable[[], Any]:
+                patch = patch_rules(rules)
+                new_data = [f'tag{i % 100}' for i in range(size)] if action == 'unique' else generators.long_array(size)
+                return lambda: patch.apply([], new_data)
+
+            cases.append(Case('apply', f'array {action} size={size}', {'shape': 'array', 'action': action, 'size': size}, setup))
+
+        def setup(size: int = size) -> Callable[[], Any]:
+            patch = patch_rules(['{*}'])
+            old_data = generators.deep_nesting(max(size.bit_length() - 1, 1), seed=1)
+            new_data = generators.deep_nesting(max(size.bit_length() - 1, 1), seed=2)
+            return lambda: patch.apply(old_data, new_data)
+
+        cases.append(Case('apply', f'deep size={size}', {'shape': 'deep', 'size': size}, setup))
+    return cases
+
+
+def all_cases(quick: bool = False) -> List[Case]:
+    rule_counts = [10, 100] if quick else [10, 100, 1000]
+    sizes = [100, 1000] if quick else [100, 1000, 10000]
+    return init_cases(rule_counts) + verify_permission_cases(rule_counts) + get_paths_cases(sizes) + apply_cases(sizes, rule_counts)
+
+
+def time_case(case: Case, repeat: int, min_time: float) -> Timing:
+    func = case.setup()
+    # calls per measurement, so that each one takes at least min_time
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return Timing(case.group, case.name, case.params, number, repeat, min(samples), statistics.median(samples))
+
+
+def git_revision() -> Optional[str]:
+    try:
+        output = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def run(cases: Iterable[Case], repeat: int = 5, min_time: float = 0.05, pattern: Optional[str] = None) -> Dict[str, Any]:
+    timings = []
+    for case in cases:
+        if pattern and pattern not in f'{case.group} {case.name}':
+            continue
+        timing = time_case(case, repeat, min_time)
+        print(f'{timing.group:<18} {timing.name:<40} {timing.best * 1e6:>12.1f} us', file=sys.stderr)
+        timings.append(asdict(timing))
+    return {
+        'version': FORMAT_VERSION,
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timings': timings,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """ One line per case present in both runs, with the ratio of best times (> 1 is slower). """
+    previous = {(timing['group'], timing['name']): timing for timing in baseline['timings']}
+    lines = []
+    for timing in current['timings']:
+        before = previous.get((timing['group'], timing['name']))
+        if before is None:
+            continue
+        ratio = timing['best'] / before['best']
+        lines.append(f"{timing['group']:<18} {timing['name']:<40} {before['best'] * 1e6:>12.1f} us {timing['best'] * 1e6:>12.1f} us {ratio:>7.2f}x")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare against')
+    parser.add_argument('--quick', action='store_true', help='smaller documents and rule sets')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.05, help='minimum seconds per measurement')
+    parser.add_argument('--filter', help='only run cases whose "group name" contains this text')
+    args = parser.parse_args(argv)
+
+    results = run(all_cases(args.quick), args.repeat, args.min_time, args.filter)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline:
+            print('\n'.join(compare(json.load(baseline), results)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,23 +1,208 @@
+import asyncio
 import re
-from typing import Any, Optional, Pattern, List, Set, Tuple, Generator
-from dataclasses import dataclass
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Any, AsyncGenerator, Callable, Dict, FrozenSet, Iterable, Optional, Pattern, List, Tuple, Generator, Union
 import pydash
 from json_patch_rules.__symbols__ import EMPTY_ARRAY_SYMBOL
+from json_patch_rules.actions import REPLACE, UNIQUE, Action, action_flags
+from json_patch_rules.paths import Segment, format_path, format_pattern, get_in, get_segment_paths, parse_path, parse_rule_path
+from json_patch_rules.writer import DocumentWriter
+from json_patch_rules.diff import MISSING, DiffTracker, child_of
+from json_patch_rules.trie import WILDCARD_INDEX, WILDCARD_KEY, RuleTrie, segments_regex
+from json_patch_rules.cache import CacheStats, DecisionCache
+from json_patch_rules import compiled
+from json_patch_rules.registry import RegistryStats, RuleRegistry
+from json_patch_rules.instrumentation import ApplyObserver, ApplyStats, StatsCollector, count_copied, iter_containers
+from json_patch_rules.streaming import apply_events, iter_events
+from json_patch_rules.operations import Operation, apply_ops, format_pointer, operation
+from json_patch_rules.analysis import RuleAnalysis, RuleIssue, analyze_rules
+from json_patch_rules.mapped import MappedDocument, RawJson
 
-@dataclass
 class RuleItem:
-    actions: Set[str]
-    current_rule: str = ''
-    path: Optional[str] = None
-    deny: bool = False
-    pattern: Optional[Pattern[str]] = None
-    parent_path: Optional[str] = None
-
-@dataclass
+    """
+    A parsed rule. actions keeps every action name and flags the known ones as Action bits.
+    segments are matched against paths, and the replace / unique target of a path is its
+    first target_size segments (a trailing "{*}" or "[*]" matches a child of the target).
+
+    pattern is still accepted in its original position for compatibility, it is compiled
+    from path on use, and only gives path when path is missing.
+    """
+
+    __slots__ = ('actions', 'flags', 'current_rule', 'path', 'deny', 'parent_path', 'segments', 'target_size', '__weakref__')
+
+    def __init__(
+        self,
+        actions: Iterable[str],
+        current_rule: str = '',
+        path: Optional[str] = None,
+        deny: bool = False,
+        pattern: Optional[Pattern[str]] = None,
+        parent_path: Optional[str] = None,
+        segments: Tuple[Segment, ...] = (),
+        target_size: Optional[int] = None,
+    ) -> None:
+        self.actions: FrozenSet[str] = frozenset(actions)
+        self.flags: int = action_flags(self.actions)
+        self.current_rule = current_rule
+        self.path = pattern.pattern if path is None and pattern is not None else path
+        self.deny = deny
+        self.parent_path = parent_path
+        self.segments = segments
+        self.target_size = len(segments) if target_size is None else target_size
+
+    @property
+    def pattern(self) -> Optional[Pattern[str]]:
+        # compiled on first use only, lookups go through the rule trie
+        return re.compile(self.path) if self.path is not None else None
+
+    def astuple(self) -> Tuple[Any, ...]:
+        return (self.actions, self.current_rule, self.path, self.deny, self.parent_path, self.segments, self.target_size)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, RuleItem):
+            return NotImplemented
+        return self.astuple() == other.astuple()
+
+    def __hash__(self) -> int:
+        return hash(self.astuple())
+
+    def __repr__(self) -> str:
+        return f"RuleItem(actions={set(self.actions)!r}, current_rule={self.current_rule!r}, deny={self.deny!r}, segments={self.segments!r})"
+
+
+# decision of paths that no rule allows, shared instead of a new RuleItem per denied path
+DENIED_RULE = RuleItem(())
+
+
 class ResultData:
-    data: Any
-    denied_paths: List[str]
-    successed_paths: List[str]
+    """
+    Result of apply. path_format is "str" (default) for paths like "user.contacts[0].label",
+    "segments" for tuples like ("user", "contacts", 0, "label"), "groups" for dicts of
+    paths with indices as "[*]" and their count, e.g. {"items[*].price": 10000}, or "count"
+    to only fill denied_count and successed_count and leave both path lists empty.
+
+    max_paths (optional) bounds the number of entries of each path list (or groups), the
+    counts still include every path.
+
+    operations is None, or with apply(emit_ops=True) the list of RFC 6902 operations that
+    turn the old document into data, see apply_ops.
+    """
+
+    __slots__ = (
+        'data', 'denied_paths', 'successed_paths', 'copy_mode', 'path_format',
+        'denied_count', 'successed_count', 'unchanged_paths', 'unchanged_count', 'operations',
+        'max_paths',
+    )
+
+    PATHS_STRING = 'str'
+    PATHS_SEGMENTS = 'segments'
+    PATHS_COUNT = 'count'
+    PATHS_GROUPS = 'groups'
+    PATH_FORMATS = (PATHS_STRING, PATHS_SEGMENTS, PATHS_COUNT, PATHS_GROUPS)
+
+    def __init__(
+        self,
+        data: Any,
+        denied_paths: List[Any],
+        successed_paths: List[Any],
+        copy_mode: str = 'deep',
+        path_format: str = PATHS_STRING,
+        unchanged_paths: Optional[List[Any]] = None,
+        max_paths: Optional[int] = None,
+    ) -> None:
+        if path_format not in self.PATH_FORMATS:
+            raise ValueError(f"Unknown path format {path_format!r}, expected one of {', '.join(map(repr, self.PATH_FORMATS))}")
+        self.data = data
+        self.copy_mode = copy_mode
+        self.path_format = path_format
+        self.max_paths = max_paths
+        self.denied_count = len(denied_paths)
+        self.successed_count = len(successed_paths)
+        # only filled by apply(diff=True, report_unchanged=True)
+        unchanged_paths = unchanged_paths if unchanged_paths is not None else []
+        self.unchanged_count = len(unchanged_paths)
+        if path_format == self.PATHS_GROUPS:
+            denied_paths, successed_paths, unchanged_paths = ({}, {}, {})
+        self.denied_paths = denied_paths
+        self.successed_paths = successed_paths
+        self.unchanged_paths = unchanged_paths
+        self.operations: Optional[List[Operation]] = None
+
+    def format(self, segments: Tuple[Segment, ...]) -> Any:
+        if self.path_format == self.PATHS_SEGMENTS:
+            return segments
+        if self.path_format == self.PATHS_GROUPS:
+            return format_pattern(segments)
+        return format_path(segments)
+
+    def add_path(self, paths: Any, path: Any, count: int = 1) -> None:
+        if self.path_format == self.PATHS_GROUPS:
+            if path in paths:
+                paths[path] += count
+            elif self.max_paths is None or len(paths) < self.max_paths:
+                paths[path] = count
+        elif self.max_paths is None or len(paths) < self.max_paths:
+            paths.append(path)
+
+    def add_denied(self, segments: Tuple[Segment, ...], is_empty: bool = False) -> None:
+        """ is_empty marks the root of new data without leaves, reported as EMPTY_ARRAY_SYMBOL. """
+        self.denied_count += 1
+        if self.path_format != self.PATHS_COUNT:
+            self.add_path(self.denied_paths, EMPTY_ARRAY_SYMBOL if is_empty else self.format(segments))
+
+    def add_successed(self, segments: Tuple[Segment, ...], is_empty: bool = False) -> None:
+        self.successed_count += 1
+        if self.path_format != self.PATHS_COUNT:
+            self.add_path(self.successed_paths, EMPTY_ARRAY_SYMBOL if is_empty else self.format(segments))
+
+    def add_unchanged(self, segments: Tuple[Segment, ...]) -> None:
+        self.unchanged_count += 1
+        if self.path_format != self.PATHS_COUNT:
+            self.add_path(self.unchanged_paths, self.format(segments))
+
+    def merge(self, other: 'ResultData') -> None:
+        """ Adds the paths and counts of other, a result of the same path_format, after those of self. """
+        for paths, other_paths in (
+            (self.denied_paths, other.denied_paths),
+            (self.successed_paths, other.successed_paths),
+            (self.unchanged_paths, other.unchanged_paths),
+        ):
+            if isinstance(other_paths, dict):
+                for path, count in other_paths.items():
+                    self.add_path(paths, path, count)
+            else:
+                for path in other_paths:
+                    self.add_path(paths, path)
+        self.denied_count += other.denied_count
+        self.successed_count += other.successed_count
+        self.unchanged_count += other.unchanged_count
+
+    def astuple(self) -> Tuple[Any, ...]:
+        return (
+            self.data, self.denied_paths, self.successed_paths, self.copy_mode, self.path_format,
+            self.denied_count, self.successed_count, self.unchanged_paths, self.unchanged_count,
+            self.operations,
+        )
+
+    @property
+    def allowed(self) -> bool:
+        """ True when no path was denied. """
+        return self.denied_count == 0
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ResultData):
+            return NotImplemented
+        return self.astuple() == other.astuple()
+
+    def __repr__(self) -> str:
+        return (
+            f"ResultData(data={self.data!r}, denied_paths={self.denied_paths!r}, "
+            f"successed_paths={self.successed_paths!r}, copy_mode={self.copy_mode!r})"
+        )
 
 
 class JsonPatchRules:
@@ -27,16 +212,125 @@ class JsonPatchRules:
     ROOT_TOKEN_ARRAY = '[*]'
     ROOT_TOKEN_ARRAY_REPLACE = '[*]|replace'
 
-    PATTERN_WILDCARD_ANY = r'(?P<ANY>.*)'
-    PATTERN_WILDCARD_ANY_KEY = r'(?P<ANY_KEY>.*)'
-    PATTERN_WILDCARD_ANY_INDEX = r'(?P<INDEX>\[\d+\])'
+    COPY_DEEP = 'deep'
+    COPY_ON_WRITE = 'cow'
+    COPY_IN_PLACE = 'in_place'
+    # copy_mode of check results, old data isn't used at all
+    COPY_NONE = 'none'
+
+    REPORT_LEAVES = 'leaf'
+    REPORT_PREFIXES = 'prefix'
+
+    ROOT_TOKENS_BY_TYPE = {
+        dict: (ROOT_TOKEN_KEY, ROOT_TOKEN_KEY_REPLACE, ROOT_TOKEN_REPLACE),
+        list: (ROOT_TOKEN_ARRAY, ROOT_TOKEN_ARRAY_REPLACE, ROOT_TOKEN_REPLACE),
+    }
+
+    NORMALIZED_INDEX = -1
+
+    def __init__(
+        self,
+        rules: List[str],
+        cache_size: int = 1024,
+        normalize_indices: bool = False,
+        observer: Optional[ApplyObserver] = None,
+    ) -> None:
+        """
+        cache_size bounds the LRU cache of decisions by concrete path (0 disables it).
+        With normalize_indices, indices that only "[*]" rules could match share a cache
+        entry, e.g. "tags[17]" and "tags[18]".
+
+        observer.on_apply(stats) is called with the ApplyStats of every apply, e.g. with a
+        StatsCollector. It can be set later with patch.observer, and isn't pickled.
+        """
+        self.setup(list(rules), [self.parse_rule(rule) for rule in rules], cache_size, normalize_indices, observer=observer)
+
+    def setup(
+        self,
+        rules: List[str],
+        rule_items: List[RuleItem],
+        cache_size: int = 1024,
+        normalize_indices: bool = False,
+        content_hash: Optional[str] = None,
+        observer: Optional[ApplyObserver] = None,
+    ) -> None:
+        self.rule_definitions: List[str] = rules
+        self.observer = observer
+        self.cache_size = cache_size
+        self.normalize_indices = normalize_indices
+        self.decision_cache = DecisionCache(cache_size) if cache_size > 0 else None
+        self.rules: List[RuleItem] = rule_items
+        self.content_hash_value = content_hash
+        self.trie = RuleTrie(self.rules)
+        self.root_rules: Dict[type, RuleItem] = {}
+        for data_type, tokens in self.ROOT_TOKENS_BY_TYPE.items():
+            for rule in self.rules:
+                if rule.current_rule in tokens:
+                    self.root_rules[data_type] = rule
+                    break
+
+    def with_observer(self, observer: Optional[ApplyObserver]) -> 'JsonPatchRules':
+        """
+        A handle sharing the parsed rules, trie and decision cache of this instance, with its
+        own observer (e.g. for an instance shared through a RuleRegistry).
+        """
+        handle = self.__class__.__new__(self.__class__)
+        handle.__dict__.update(self.__dict__)
+        handle.observer = observer
+        return handle
 
-    def __init__(self, rules: List[str]) -> None:
-        self.rules: List[RuleItem] = [self.parse_rule(rule) for rule in rules]
+    def __reduce__(self):
+        # Workers rebuild the trie from the parsed rules, which is cheaper to send than the trie itself
+        return (self.__class__.from_compiled, (self.to_compiled(), self.cache_size, self.normalize_indices))
+
+    @property
+    def content_hash(self) -> str:
+        """ Hash of the compiled rules, see compiled.content_hash. """
+        if self.content_hash_value is None:
+            self.content_hash_value = compiled.content_hash(self.rule_definitions, self.records())
+        return self.content_hash_value
+
+    def records(self) -> List[compiled.Record]:
+        return [
+            (rule.current_rule, rule.deny, sorted(rule.actions), rule.parent_path, rule.path, list(rule.segments), rule.target_size)
+            for rule in self.rules
+        ]
+
+    def to_compiled(self) -> Dict[str, Any]:
+        """ Parsed rules as a JSON serializable dict, loaded back with from_compiled without parsing any rule. """
+        artifact = compiled.pack(self.rule_definitions, self.records())
+        self.content_hash_value = artifact['hash']
+        return artifact
+
+    @classmethod
+    def from_compiled(
+        cls,
+        artifact: Union[Dict[str, Any], str, bytes],
+        cache_size: int = 1024,
+        normalize_indices: bool = False,
+        observer: Optional[ApplyObserver] = None,
+    ) -> 'JsonPatchRules':
+        """ Builds an instance from to_compiled output (or its JSON text), raises ValueError if it isn't valid. """
+        rules, records, content_hash = compiled.unpack(artifact)
+        rule_items = [
+            RuleItem(actions, current_rule=current_rule, path=path, deny=deny, parent_path=parent_path, segments=tuple(segments), target_size=target_size)
+            for current_rule, deny, actions, parent_path, path, segments, target_size in records
+        ]
+        patch = cls.__new__(cls)
+        patch.setup(rules, rule_items, cache_size, normalize_indices, content_hash, observer)
+        return patch
+
+    def analyze(self) -> RuleAnalysis:
+        """
+        Reports rules that never change a decision: deny rules (a path is denied when no rule
+        allows it, so they either conflict with an allowing rule or are redundant) and allowing
+        rules duplicated or shadowed by earlier ones. analysis.minimized is the rule list
+        without them, loading it gives the same decisions with fewer rules to match.
+        """
+        return analyze_rules(self.rules, self.root_rules)
 
     def parse_rule(self, current_rule: str) -> RuleItem:
         deny = current_rule.startswith('!')
-        rule_item = RuleItem(set(), deny=deny, current_rule=current_rule)
 
         rule = current_rule[1:] if deny else current_rule
         parts = rule.split('|')
@@ -45,27 +339,36 @@ class JsonPatchRules:
         path = re.sub(r'\[\*\]+$', '', path)
         path = re.sub(r'\[\d\]+$', '', path)
         path = re.sub(r'\{\*\}+$', '', path)
-        rule_item.parent_path = path
+        parent_path = path
+        target = parse_rule_path(parent_path)
+        segments = target
+        rule_segments = parse_rule_path(parts[0])
+        if target and rule_segments[:-1] == target and rule_segments[-1] in (WILDCARD_KEY, WILDCARD_INDEX):
+            # "user.{*}" targets user but only matches its children, never user itself
+            segments = rule_segments
+        actions = parts[1:] if len(parts) > 1 else ['set']
 
-        path = path.replace('{*}', self.PATTERN_WILDCARD_ANY_KEY)
-        path = path.replace('[*]', self.PATTERN_WILDCARD_ANY_INDEX)
-
-        # ATTENTION: It must be after any replace that contains "*" character
-        path = path.replace('*', self.PATTERN_WILDCARD_ANY)
-        actions = set(parts[1:]) if len(parts) > 1 else {'set'}
-        pattern = re.compile(f'^{path}')
-
-        rule_item.path = path
-        rule_item.pattern = pattern
-        rule_item.actions = actions
-
-        return rule_item
+        return RuleItem(
+            actions, current_rule, segments_regex(segments), deny,
+            parent_path=parent_path, segments=segments, target_size=len(target),
+        )
 
     def to_unique(self, items: List[Any]) -> List[Any]:
         ordered_list = []
+        seen = set()
+        unhashable = []
         for item in items:
-            if item not in ordered_list:
-                ordered_list.append(item)
+            try:
+                key = freeze(item)
+                if key in seen:
+                    continue
+                seen.add(key)
+            except TypeError:
+                # values that aren't JSON types and can't be hashed fall back to a linear scan
+                if item in unhashable:
+                    continue
+                unhashable.append(item)
+            ordered_list.append(item)
         return ordered_list
 
     def get_paths(self, obj: Any, current_path: str = "") -> Generator[str, str, str | None]:
@@ -80,78 +383,753 @@ class JsonPatchRules:
         else:
             yield current_path
 
+    def get_root_rule(self, new_data: Any) -> Optional[RuleItem]:
+        if isinstance(new_data, dict):
+            return self.root_rules.get(dict)
+        if isinstance(new_data, list):
+            return self.root_rules.get(list)
+        return None
+
     def verify_permission(self, data_path: str, new_data: Any) -> Tuple[bool, RuleItem, Optional[str]]:
-        check_all_responses = []
-        for rule in self.rules:
-            if self.ROOT_TOKEN_KEY == rule.current_rule and isinstance(new_data, dict):
-                return (True, rule, None)
-            elif self.ROOT_TOKEN_ARRAY == rule.current_rule and isinstance(new_data, list):
-                return (True, rule, None)
-            elif self.ROOT_TOKEN_KEY_REPLACE == rule.current_rule and isinstance(new_data, dict):
-                return (True, rule, None)
-            elif self.ROOT_TOKEN_ARRAY_REPLACE == rule.current_rule and isinstance(new_data, list):
-                return (True, rule, None)
-            elif self.ROOT_TOKEN_REPLACE == rule.current_rule and isinstance(new_data, (list, dict)):
-                return (True, rule, None)
-
-            match_result = rule.pattern and rule.pattern.match(data_path)
-            allow = (match_result and not rule.deny) or data_path.startswith(rule.current_rule)
-            check_all_responses.append((allow, rule, data_path))
-
-        # Check if has at least a single allow=True
-        for item in check_all_responses:
-            if item[0]:
-                return item
-
-        return (False, RuleItem(set([])), None)
-
-    def apply(self, old_data: Any, new_data: Any) -> ResultData:
-        result = ResultData(pydash.clone_deep(old_data), [], [])
-
-        actions_data = {"unique": []}
-        value_obj_paths = list(self.get_paths(new_data))
-        
-        if len(value_obj_paths) == 0:
-            value_obj_paths = [EMPTY_ARRAY_SYMBOL]
-
-        for path in value_obj_paths:
-            is_allowed, rule_item, data_path = self.verify_permission(path, new_data)
-            if is_allowed:
-                should_replace = 'replace' in rule_item.actions
-                should_be_unique = 'unique' in rule_item.actions
-
-                result.successed_paths.append(path)
-                if should_replace and data_path is None:
-                    result.data = new_data
-                elif should_replace and data_path:
-                    pydash.set_(result.data, rule_item.path, pydash.get(new_data, rule_item.path))
-                elif should_be_unique:
-                    new_value = pydash.get(new_data, path)
-                    pydash.get(result.data, rule_item.path, []).append(new_value)
-                else:
-                    new_value = pydash.get(new_data, path)
-                    pydash.set_(result.data, path, new_value)
-
-                ### 1) Unique + Replace = It allows user to remove itens from array
-                if should_be_unique and should_replace:
-                    actions_data["unique"].append((rule_item, data_path))
-                ### 2) Unique  = It add new itens to array if not exists
-                elif should_be_unique and not should_replace:
-                    actions_data["unique"].append((rule_item, data_path))
+        is_allowed, rule_item, segments = self.verify_segments(parse_path(data_path), new_data)
+        return (is_allowed, rule_item, data_path if segments is not None else None)
+
+    def verify_segments(self, segments: Tuple[Segment, ...], new_data: Any) -> Tuple[bool, RuleItem, Optional[Tuple[Segment, ...]]]:
+        # Root tokens ("{*}", "[*]|replace", "*|replace"...) win over any other rule
+        root_rule = self.get_root_rule(new_data)
+        if root_rule is not None:
+            return (True, root_rule, None)
+
+        rule = self.trie.lookup(segments)
+        if rule is not None:
+            return (True, rule, segments)
+
+        return (False, DENIED_RULE, None)
+
+    def verify_prefix(self, segments: Tuple[Segment, ...], new_data: Any, kind: Optional[type] = None) -> Optional[Tuple[bool, RuleItem, Optional[Tuple[Segment, ...]]]]:
+        """
+        Same decision as verify_segments, shared by every path under segments, or None if
+        paths below differ. kind is the type (dict or list) of the container at segments.
+        """
+        root_rule = self.get_root_rule(new_data)
+        if root_rule is not None:
+            return (True, root_rule, None)
+
+        is_decided, rule = self.trie.lookup_prefix(segments, kind)
+        if not is_decided:
+            return None
+        if rule is not None and rule.flags & REPLACE and rule.target_size > len(segments):
+            # decided by a rule matching every child, each child is a replace target of its own
+            return None
+        if rule is not None:
+            return (True, rule, segments)
+
+        return (False, DENIED_RULE, None)
+
+    def cache_stats(self) -> Optional[CacheStats]:
+        return self.decision_cache.stats() if self.decision_cache else None
+
+    def decision_key(self, segments: Tuple[Segment, ...], new_data: Any) -> Tuple[Any, ...]:
+        kind = dict if isinstance(new_data, dict) else list if isinstance(new_data, list) else None
+        if self.normalize_indices:
+            positions = self.trie.literal_index_positions
+            segments = tuple(
+                self.NORMALIZED_INDEX if isinstance(segment, int) and position not in positions else segment
+                for position, segment in enumerate(segments)
+            )
+        return (kind, segments)
+
+    def decide(
+        self,
+        segments: Tuple[Segment, ...],
+        new_data: Any,
+        decisions: Optional[Dict[Any, Tuple[bool, RuleItem, Optional[Tuple[Segment, ...]]]]] = None,
+    ) -> Tuple[bool, RuleItem, Optional[Tuple[Segment, ...]]]:
+        """ Cached version of verify_segments, decisions is an optional dict used before the LRU cache. """
+        cache = self.decision_cache
+        if decisions is None and cache is None:
+            return self.verify_segments(segments, new_data)
+
+        key = self.decision_key(segments, new_data)
+        decision = decisions.get(key) if decisions is not None else cache.get(key)
+        if decision is None:
+            decision = self.verify_segments(segments, new_data)
+            if decisions is not None:
+                decisions[key] = decision
             else:
-                result.denied_paths.append(path)
+                cache.put(key, decision)
+
+        is_allowed, rule_item, data_path = decision
+        return (is_allowed, rule_item, segments if data_path is not None else None)
+
+    def create_writer(self, old_data: Any, copy: str, in_place: bool, result: ResultData, emit_ops: bool = False) -> DocumentWriter:
+        """ Writer of the patched document, result.copy_mode is set to the mode used. """
+        recorder = None
+        if emit_ops:
+            operations = result.operations = []
+            recorder = lambda op, segments, value: operations.append(operation(op, segments, value))
+        if in_place:
+            result.copy_mode = self.COPY_IN_PLACE
+            return DocumentWriter(old_data, recorder=recorder)
+        if copy == self.COPY_DEEP:
+            result.copy_mode = self.COPY_DEEP
+            return DocumentWriter(pydash.clone_deep(old_data), recorder=recorder)
+        if copy == self.COPY_ON_WRITE:
+            result.copy_mode = self.COPY_ON_WRITE
+            return DocumentWriter(old_data, copy_on_write=True, recorder=recorder)
+        raise ValueError(f"Unknown copy mode {copy!r}, expected {self.COPY_DEEP!r} or {self.COPY_ON_WRITE!r}")
+
+    def apply(
+        self,
+        old_data: Any,
+        new_data: Any,
+        copy: str = COPY_DEEP,
+        in_place: bool = False,
+        decisions: Optional[Dict[Any, Tuple[bool, RuleItem, Optional[Tuple[Segment, ...]]]]] = None,
+        report_paths: str = REPORT_LEAVES,
+        path_format: str = ResultData.PATHS_STRING,
+        diff: bool = False,
+        report_unchanged: bool = False,
+        emit_ops: bool = False,
+        max_paths: Optional[int] = None,
+    ) -> ResultData:
+        """
+        copy="deep" (default) patches a deep clone of old_data. copy="cow" only copies the
+        containers along modified paths and shares untouched subtrees with old_data, and
+        in_place=True writes straight into old_data. Always read the patched document from
+        result.data, since root level replaces can't happen in place.
+
+        decisions is an optional dict used instead of the instance LRU cache to reuse
+        rule decisions of repeated paths across calls (see apply_many).
+
+        Subtrees decided by a single rule aren't walked leaf by leaf. With report_paths="leaf"
+        (default) denied_paths and successed_paths still list every leaf, and with
+        report_paths="prefix" a denied or replaced subtree is reported once by its own path.
+        path_format chooses how paths are reported and max_paths bounds how many are kept,
+        see ResultData. Use iter_paths to go through every path without keeping them.
+
+        With diff=True, values of new_data equal to old_data at the same path are skipped
+        without checking rules, so the cost follows the size of the change. Their paths are
+        left out of the result, or listed in unchanged_paths with report_unchanged=True.
+        Only changed values trigger actions: removed keys and new empty containers are
+        applied when their container is itself decided by a replace rule (e.g. removing an
+        item under "contacts|replace"), not when an unchanged sibling would trigger it.
+
+        With emit_ops=True, result.operations lists the RFC 6902 "add" and "replace"
+        operations that were applied, in order. Replaying them on old_data with apply_ops
+        gives result.data, a replaced subtree is a single "replace" of its target.
+        """
+        steps = self.iter_apply(old_data, new_data, copy, in_place, decisions, report_paths, path_format, diff, report_unchanged, emit_ops=emit_ops, max_paths=max_paths)
+        return run_steps(steps)
+
+    def iter_apply(
+        self,
+        old_data: Any,
+        new_data: Any,
+        copy: str = COPY_DEEP,
+        in_place: bool = False,
+        decisions: Optional[Dict[Any, Tuple[bool, RuleItem, Optional[Tuple[Segment, ...]]]]] = None,
+        report_paths: str = REPORT_LEAVES,
+        path_format: str = ResultData.PATHS_STRING,
+        diff: bool = False,
+        report_unchanged: bool = False,
+        pause_every: int = 0,
+        emit_ops: bool = False,
+        max_paths: Optional[int] = None,
+    ) -> Generator[None, None, ResultData]:
+        """
+        Same as apply, as a generator that pauses (yields None) after every pause_every
+        leaves (never when 0) and returns the result, see apply_async.
+        """
+        if report_paths not in (self.REPORT_LEAVES, self.REPORT_PREFIXES):
+            raise ValueError(f"Unknown report mode {report_paths!r}, expected {self.REPORT_LEAVES!r} or {self.REPORT_PREFIXES!r}")
+
+        observer = self.observer
+        stats = ApplyStats() if observer is not None else None
+        if stats is not None:
+            started = time.perf_counter()
+
+        result = ResultData(None, [], [], path_format=path_format, max_paths=max_paths)
+        writer = self.create_writer(old_data, copy, in_place, result, emit_ops)
+        copy_mode = result.copy_mode
+        if stats is not None:
+            stats.copy_time = time.perf_counter() - started
+            if copy_mode == self.COPY_DEEP:
+                count_copied(iter_containers(writer.root), stats)
+
+        # targets of unique rules, deduplicated once each after all paths are applied
+        actions_data: Dict[str, Dict[Tuple[Segment, ...], RuleItem]] = {"unique": {}}
+
+        def replace(target: Tuple[Segment, ...]) -> None:
+            # the replaced subtree is new data, later unique appends must not change it
+            writer.set_borrowed(target, get_in(new_data, target))
+
+        tracker = DiffTracker(old_data, result, report_unchanged, report_paths == self.REPORT_PREFIXES) if diff else None
+
+        if next(get_segment_paths(new_data), None) is None:
+            decision = self.decide((), new_data, decisions)
+            self.apply_path(result, writer, actions_data, (), EMPTY_ARRAY_SYMBOL, decision, replace)
+        elif tracker is None or not tracker.unchanged((), new_data, old_data):
+            yield from self.apply_tree(result, writer, actions_data, new_data, decisions, report_paths, replace, pause_every, stats, tracker)
 
-        for item in actions_data["unique"]:
-            rule_item, data_path = item
-            current_value = pydash.get(result.data, rule_item.path)
+        if stats is None:
+            self.finish(result, writer, actions_data)
+            return result
+
+        traversed = time.perf_counter()
+        self.finish(result, writer, actions_data)
+        finished = time.perf_counter()
+        stats.copy_mode = copy_mode
+        stats.traverse_time = traversed - started - stats.copy_time
+        stats.unique_time = finished - traversed
+        stats.total_time = finished - started
+        stats.allowed_paths = result.successed_count
+        stats.denied_paths = result.denied_count
+        if copy_mode != self.COPY_DEEP:
+            count_copied(writer.owned.values(), stats)
+        observer.on_apply(stats)
+        return result
+
+    def apply_tree(
+        self,
+        result: ResultData,
+        writer: DocumentWriter,
+        actions_data: Dict[str, Dict[Tuple[Segment, ...], RuleItem]],
+        new_data: Any,
+        decisions: Optional[Dict[Any, Tuple[bool, RuleItem, Optional[Tuple[Segment, ...]]]]],
+        report_paths: str,
+        replace: Callable[[Tuple[Segment, ...]], None],
+        pause_every: int = 0,
+        stats: Optional[ApplyStats] = None,
+        tracker: Optional[DiffTracker] = None,
+    ) -> Generator[None, None, None]:
+        """
+        Walks new_data, stopping at every container whose whole subtree is decided by the same rule.
+        With a tracker, values equal to old data are skipped.
+        """
+        applied = 0
+        decide, verify_prefix = self.decide, self.verify_prefix
+        if stats is not None:
+            decide = stats.counting('decisions', decide)
+            verify_prefix = stats.counting('prefix_checks', verify_prefix)
+
+        def visit(segments: Tuple[Segment, ...], value: Any, old_value: Any, tracker: Optional[DiffTracker]) -> Generator[None, None, None]:
+            nonlocal applied
+            # with a tracker the root is checked too, so root replace rules see removed keys
+            if segments or tracker is not None:
+                # the root kind isn't used: apply_parallel chunks of arrays are dicts keyed by index
+                decision = verify_prefix(segments, new_data, type(value) if segments else None)
+                if decision is not None:
+                    leaves = tracker.changed_leaves(segments, value, old_value) if tracker is not None else None
+                    yield from self.apply_subtree(result, writer, actions_data, segments, value, decision, report_paths, replace, pause_every, leaves)
+                    return
+
+            for segment, child in value.items() if isinstance(value, dict) else enumerate(value):
+                child_segments = segments + (segment,)
+                old_child = MISSING
+                if tracker is not None:
+                    old_child = child_of(old_value, segment)
+                    if tracker.unchanged(child_segments, child, old_child):
+                        continue
+
+                if isinstance(child, (dict, list)):
+                    yield from visit(child_segments, child, old_child, tracker)
+                    continue
+
+                decision = decide(child_segments, new_data, decisions)
+                self.apply_path(result, writer, actions_data, child_segments, child, decision, replace)
+                applied += 1
+                if applied == pause_every:
+                    applied = 0
+                    yield
+
+        if isinstance(new_data, (dict, list)):
+            yield from visit((), new_data, tracker.old_data if tracker is not None else MISSING, tracker)
+        else:
+            decision = decide((), new_data, decisions)
+            self.apply_path(result, writer, actions_data, (), new_data, decision, replace)
+
+    def apply_subtree(
+        self,
+        result: ResultData,
+        writer: DocumentWriter,
+        actions_data: Dict[str, Dict[Tuple[Segment, ...], RuleItem]],
+        segments: Tuple[Segment, ...],
+        value: Any,
+        decision: Tuple[bool, RuleItem, Optional[Tuple[Segment, ...]]],
+        report_paths: str,
+        replace: Callable[[Tuple[Segment, ...]], None],
+        pause_every: int = 0,
+        leaves: Optional[Iterable[Tuple[Tuple[Segment, ...], Any]]] = None,
+    ) -> Generator[None, None, None]:
+        """
+        Applies a container of new data whose leaves all share the given decision. leaves
+        overrides the leaves to apply and report, e.g. only the changed ones with diff=True.
+        """
+        if next(get_segment_paths(value), None) is None:
+            # empty containers have no leaves to apply, same as when they are walked
+            return
+        if leaves is None:
+            leaves = get_segment_paths(value, segments)
+        if pause_every:
+            leaves = pausing(leaves, pause_every)
+
+        is_allowed, rule_item, data_path = decision
+        if is_allowed and not rule_item.flags & REPLACE:
+            # sets merge leaf by leaf into old data, only the rule lookups are skipped
+            for leaf in leaves:
+                if leaf is None:
+                    yield
+                    continue
+                self.apply_path(result, writer, actions_data, leaf[0], leaf[1], decision, replace)
+            return
+
+        report = result.add_successed if is_allowed else result.add_denied
+        if report_paths == self.REPORT_PREFIXES and segments:
+            report(segments)
+        else:
+            for leaf in leaves:
+                if leaf is None:
+                    yield
+                    continue
+                report(leaf[0])
+        if not is_allowed:
+            return
+
+        # a single replace of the target covers every leaf below it
+        target = segments[:rule_item.target_size] if data_path is not None else ()
+        replace(target)
+        if rule_item.flags & UNIQUE:
+            actions_data["unique"].setdefault(target, rule_item)
+
+    def apply_stream(
+        self,
+        old_data: Any,
+        stream: Any,
+        copy: str = COPY_DEEP,
+        in_place: bool = False,
+        backend: Optional[str] = None,
+        path_format: str = ResultData.PATHS_STRING,
+        emit_ops: bool = False,
+        max_paths: Optional[int] = None,
+    ) -> ResultData:
+        """
+        Same as apply, but new data is a file-like object, str/bytes or an iterator of
+        str/bytes chunks parsed incrementally. Leaves are checked as they arrive and only
+        subtrees that a replace rule may need are built in memory. backend can be
+        "python" (stdlib parser) or "ijson", by default ijson is used when installed.
+        path_format, emit_ops and max_paths are the same as in apply.
+        """
+        result = ResultData(None, [], [], path_format=path_format, max_paths=max_paths)
+        writer = self.create_writer(old_data, copy, in_place, result, emit_ops)
+        apply_events(self, result, writer, iter_events(stream, backend))
+        return result
+
+    def check(
+        self,
+        new_data: Any,
+        fail_fast: bool = False,
+        decisions: Optional[Dict[Any, Tuple[bool, RuleItem, Optional[Tuple[Segment, ...]]]]] = None,
+        report_paths: str = REPORT_LEAVES,
+        path_format: str = ResultData.PATHS_STRING,
+        max_paths: Optional[int] = None,
+    ) -> ResultData:
+        """
+        Checks the permissions of new_data without patching anything, result.data is None and
+        result.allowed tells whether apply would deny any path. denied_paths and successed_paths
+        are the same as apply reports, unless fail_fast stops the walk at the first denied path.
+        """
+        if report_paths not in (self.REPORT_LEAVES, self.REPORT_PREFIXES):
+            raise ValueError(f"Unknown report mode {report_paths!r}, expected {self.REPORT_LEAVES!r} or {self.REPORT_PREFIXES!r}")
+
+        result = ResultData(None, [], [], self.COPY_NONE, path_format, max_paths=max_paths)
+        for segments, is_allowed, is_empty in self.iter_decisions(new_data, decisions, report_paths):
+            if is_allowed:
+                result.add_successed(segments, is_empty)
+                continue
+            result.add_denied(segments, is_empty)
+            if fail_fast:
+                break
+        return result
+
+    def iter_paths(
+        self,
+        new_data: Any,
+        report_paths: str = REPORT_LEAVES,
+        path_format: str = ResultData.PATHS_STRING,
+    ) -> Generator[Tuple[Any, bool], None, None]:
+        """
+        Lazily yields (path, is_allowed) for every path apply would report, in the same order.
+        Only the path being walked is kept in memory, so it suits patches with millions of
+        leaves (e.g. apply with path_format="count", then iter_paths for the details).
+        """
+        result = ResultData(None, [], [], path_format=path_format)
+        for segments, is_allowed, is_empty in self.iter_decisions(new_data, report_paths=report_paths):
+            yield (EMPTY_ARRAY_SYMBOL if is_empty else result.format(segments), is_allowed)
+
+    def iter_decisions(
+        self,
+        new_data: Any,
+        decisions: Optional[Dict[Any, Tuple[bool, RuleItem, Optional[Tuple[Segment, ...]]]]] = None,
+        report_paths: str = REPORT_LEAVES,
+    ) -> Generator[Tuple[Tuple[Segment, ...], bool, bool], None, None]:
+        """ (segments, is_allowed, is_empty) of every path apply would report, in the same order. """
+        if next(get_segment_paths(new_data), None) is None:
+            is_allowed, _, _ = self.decide((), new_data, decisions)
+            yield ((), is_allowed, True)
+            return
+
+        def visit(segments: Tuple[Segment, ...], value: Any) -> Generator[Tuple[Tuple[Segment, ...], bool, bool], None, None]:
+            if segments:
+                decision = self.verify_prefix(segments, new_data, type(value))
+                if decision is not None:
+                    is_allowed = decision[0]
+                    if report_paths == self.REPORT_PREFIXES and not (is_allowed and not decision[1].flags & REPLACE):
+                        # same as apply_subtree, which reports denied and replaced subtrees once
+                        if next(get_segment_paths(value), None) is not None:
+                            yield (segments, is_allowed, False)
+                        return
+                    for leaf_segments, _ in get_segment_paths(value, segments):
+                        yield (leaf_segments, is_allowed, False)
+                    return
+
+            for segment, child in value.items() if isinstance(value, dict) else enumerate(value):
+                child_segments = segments + (segment,)
+                if isinstance(child, (dict, list)):
+                    yield from visit(child_segments, child)
+                    continue
+                is_allowed, _, _ = self.decide(child_segments, new_data, decisions)
+                yield (child_segments, is_allowed, False)
+
+        if isinstance(new_data, (dict, list)):
+            yield from visit((), new_data)
+        else:
+            is_allowed, _, _ = self.decide((), new_data, decisions)
+            yield ((), is_allowed, False)
+
+    def apply_file(self, path: str, new_data: Any, output: Optional[str] = None, **options: Any) -> ResultData:
+        """
+        Same as apply, with old data read from the JSON file at path through a MappedDocument:
+        only the containers along the paths of new_data are parsed, and the patched document
+        is written to output (or atomically replaces path when None), copying untouched
+        values as byte ranges of the original file. result.data is None.
+
+        Values that aren't parsed can't be compared, so with diff=True only the paths present
+        in both documents are skipped when unchanged. copy and in_place are ignored.
+        """
+        options.pop('copy', None)
+        options.pop('in_place', None)
+        with MappedDocument(path) as document:
+            result = self.apply(document.view(new_data), new_data, copy=self.COPY_ON_WRITE, **options)
+            document.save(result.data, output)
+        result.data = None
+        return result
+
+    def apply_path(
+        self,
+        result: ResultData,
+        writer: DocumentWriter,
+        actions_data: Dict[str, Dict[Tuple[Segment, ...], RuleItem]],
+        segments: Tuple[Segment, ...],
+        new_value: Any,
+        decision: Tuple[bool, RuleItem, Optional[Tuple[Segment, ...]]],
+        replace: Callable[[Tuple[Segment, ...]], None],
+    ) -> None:
+        """ Applies a single leaf of new data, replace(target) must copy the new value at target into writer. """
+        is_empty = new_value is EMPTY_ARRAY_SYMBOL
+        is_allowed, rule_item, data_path = decision
+        if not is_allowed:
+            result.add_denied(segments, is_empty)
+            return
+
+        should_replace = rule_item.flags & REPLACE
+        should_be_unique = rule_item.flags & UNIQUE
+        target = segments[:rule_item.target_size] if data_path is not None else ()
+
+        result.add_successed(segments, is_empty)
+        if should_replace:
+            replace(target)
+        elif new_value is EMPTY_ARRAY_SYMBOL:
+            pass
+        elif should_be_unique:
+            writer.append(target, new_value)
+        else:
+            writer.set(segments, new_value)
+
+        ### 1) Unique + Replace = It allows user to remove itens from array
+        ### 2) Unique  = It add new itens to array if not exists
+        if should_be_unique and new_value is not EMPTY_ARRAY_SYMBOL:
+            actions_data["unique"].setdefault(target, rule_item)
+
+    def finish(self, result: ResultData, writer: DocumentWriter, actions_data: Dict[str, Dict[Tuple[Segment, ...], RuleItem]]) -> None:
+        for target in actions_data["unique"]:
+            current_value = get_in(writer.root, target)
             if isinstance(current_value, list):
-                pydash.set_(result.data, rule_item.path, self.to_unique(current_value))
-            elif isinstance(result.data, list): # should support all json types except list and object
-                for item in new_data:
-                    result.data.append(item)
-                    result.data = self.to_unique(result.data)
+                unique_value = self.to_unique(current_value)
+                if len(unique_value) != len(current_value):
+                    writer.set(target, unique_value)
 
+        result.data = writer.root
+
+    def apply_many(
+        self,
+        pairs: Iterable[Tuple[Any, Any]],
+        executor: Optional[Executor] = None,
+        chunk_size: int = 100,
+        max_pending_chunks: int = 8,
+        **options: Any,
+    ) -> Generator[ResultData, None, None]:
+        """
+        Applies many (old_data, new_data) pairs lazily, yielding results in the same order.
+        Rule decisions are shared within chunks of chunk_size pairs.
+
+        With a thread or process executor, pairs are sent in chunks of chunk_size and at
+        most max_pending_chunks are in flight, so memory stays flat for long iterables.
+        Note that in_place=True has no effect on the caller's objects with a process pool.
+        """
+        pairs = iter(pairs)
+        if executor is None:
+            while True:
+                chunk = list(islice(pairs, chunk_size))
+                if not chunk:
+                    return
+                # decisions of one chunk only, so they don't grow with the iterable
+                decisions = {}
+                for old_data, new_data in chunk:
+                    yield self.apply(old_data, new_data, decisions=decisions, **options)
+
+        pending = deque()
+        while True:
+            chunk = list(islice(pairs, chunk_size))
+            if not chunk:
+                break
+            pending.append(executor.submit(apply_chunk, self, chunk, options))
+            if len(pending) >= max_pending_chunks:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+    def apply_parallel(
+        self,
+        old_data: Any,
+        new_data: Any,
+        executor: Optional[Executor] = None,
+        chunk_size: int = 1000,
+        max_workers: Optional[int] = None,
+        **options: Any,
+    ) -> ResultData:
+        """
+        Same result as apply for a large top level array or object: its items are split in
+        chunks of chunk_size and applied in executor (a process pool of max_workers, created
+        for the call, when None), then merged in order. Paths below an item only depend on
+        that item, so unique targets are deduplicated within their chunk.
+
+        Falls back to apply when new data has fewer than two chunks of items, isn't the same
+        container type as old data, when root rules (or rules without segments) may decide
+        the whole document, or with emit_ops. The observer is called once for the whole call,
+        with the decisions, copies and traverse / unique times of every chunk summed.
+        """
+        if (
+            options.get('emit_ops')
+            or not isinstance(new_data, (dict, list))
+            or type(old_data) is not type(new_data)
+            or len(new_data) < 2 * chunk_size
+            or self.root_rules
+            or self.trie.root.allow is not None
+            or not has_leaves(new_data, 1)
+        ):
+            return self.apply(old_data, new_data, **options)
+
+        observer = self.observer
+        started = time.perf_counter()
+        copy = options.pop('copy', self.COPY_DEEP)
+        in_place = options.pop('in_place', False)
+        options.pop('decisions', None)
+        result = ResultData(None, [], [], path_format=options.get('path_format', ResultData.PATHS_STRING), max_paths=options.get('max_paths'))
+        writer = self.create_writer(old_data, copy, in_place, result)
+        # sums the stats of every chunk, reported once as the stats of the call
+        collector = StatsCollector() if observer is not None else None
+        if collector is not None:
+            collector.totals.copy_time = time.perf_counter() - started
+            if result.copy_mode == self.COPY_DEEP:
+                count_copied(iter_containers(writer.root), collector.totals)
+
+        items = iter(new_data.items()) if isinstance(new_data, dict) else enumerate(new_data)
+        old_items = old_data if isinstance(old_data, dict) else dict(enumerate(old_data))
+        own_executor = executor is None
+        if own_executor:
+            executor = ProcessPoolExecutor(max_workers)
+        try:
+            pending = []
+            while True:
+                chunk = dict(islice(items, chunk_size))
+                if not chunk:
+                    break
+                old_chunk = {segment: old_items[segment] for segment in chunk if segment in old_items}
+                pending.append(executor.submit(apply_children, self, old_chunk, chunk, options, collector is not None))
+            for future in pending:
+                changed, part, chunk_stats = future.result()
+                for segment, value in changed:
+                    writer.set((segment,), value)
+                result.merge(part)
+                if chunk_stats is not None:
+                    collector.on_apply(chunk_stats)
+        finally:
+            if own_executor:
+                executor.shutdown()
+
+        result.data = writer.root
+        if collector is not None:
+            stats = collector.totals
+            stats.copy_mode = result.copy_mode
+            stats.total_time = time.perf_counter() - started
+            stats.allowed_paths = result.successed_count
+            stats.denied_paths = result.denied_count
+            observer.on_apply(stats)
         return result
 
-def patch_rules(rules: List[str]) -> JsonPatchRules:
-    return JsonPatchRules(rules)
\ No newline at end of file
+
+    async def apply_async(
+        self,
+        old_data: Any,
+        new_data: Any,
+        pause_every: int = 1000,
+        executor: Optional[Executor] = None,
+        offload_threshold: Optional[int] = None,
+        **options: Any,
+    ) -> ResultData:
+        """
+        Same result as apply, without blocking the event loop for long. By default control
+        goes back to the loop after every pause_every leaves. When offload_threshold is set
+        and new_data has at least that many leaves, the whole apply runs in executor
+        instead (the loop default executor if None).
+        """
+        if offload_threshold is not None and has_leaves(new_data, offload_threshold):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, partial(self.apply, old_data, new_data, **options))
+
+        steps = self.iter_apply(old_data, new_data, pause_every=pause_every, **options)
+        while True:
+            try:
+                next(steps)
+            except StopIteration as stop:
+                return stop.value
+            await asyncio.sleep(0)
+
+    async def apply_many_async(
+        self,
+        pairs: Iterable[Tuple[Any, Any]],
+        concurrency: int = 8,
+        **options: Any,
+    ) -> AsyncGenerator[ResultData, None]:
+        """
+        Async version of apply_many, at most concurrency pairs are applied at the same time
+        (see apply_async for options) and results are yielded in the same order as pairs.
+        """
+        pending = deque()
+        try:
+            for old_data, new_data in pairs:
+                pending.append(asyncio.ensure_future(self.apply_async(old_data, new_data, **options)))
+                if len(pending) >= concurrency:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+
+def freeze(value: Any) -> Any:
+    """ Hashable key of a JSON value, equal values (dicts in any key order) give equal keys. """
+    if isinstance(value, RawJson):
+        value = value.value()
+    if isinstance(value, dict):
+        return (dict, frozenset((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return (list, tuple(freeze(item) for item in value))
+    hash(value)
+    return value
+
+
+def run_steps(steps: Generator[None, None, Any]) -> Any:
+    """ Runs a pausing generator (e.g. iter_apply) to the end and returns its result. """
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+def has_leaves(obj: Any, count: int) -> bool:
+    """ Whether obj has at least count leaves, it stops walking as soon as it knows. """
+    for seen, _ in enumerate(get_segment_paths(obj), 1):
+        if seen >= count:
+            return True
+    return count <= 0
+
+
+def pausing(items: Iterable[Any], every: int) -> Generator[Any, None, None]:
+    """ Yields items with a None after every "every" items. """
+    count = 0
+    for item in items:
+        yield item
+        count += 1
+        if count == every:
+            count = 0
+            yield None
+
+
+def apply_chunk(patch: JsonPatchRules, pairs: List[Tuple[Any, Any]], options: Dict[str, Any]) -> List[ResultData]:
+    decisions = {}
+    return [patch.apply(old_data, new_data, decisions=decisions, **options) for old_data, new_data in pairs]
+
+
+def apply_children(
+    patch: JsonPatchRules,
+    old_items: Dict[Segment, Any],
+    new_items: Dict[Segment, Any],
+    options: Dict[str, Any],
+    collect_stats: bool = False,
+) -> Tuple[List[Tuple[Segment, Any]], ResultData, Optional[ApplyStats]]:
+    """
+    Applies some top level items of new data (by key or index) for apply_parallel. Returns
+    the items that changed, the result without data and, with collect_stats, the stats of
+    the chunk. The observer of patch isn't called.
+    """
+    collector = StatsCollector() if collect_stats else None
+    patch = patch.with_observer(collector)
+    if not has_leaves(new_items, 1):
+        # an item without leaves is skipped like in apply, not reported as an empty document
+        empty = ResultData(None, [], [], path_format=options.get('path_format', ResultData.PATHS_STRING), max_paths=options.get('max_paths'))
+        return ([], empty, None)
+
+    # a dict keyed by indices walks and reports the same paths as the items of a list
+    result = patch.apply(old_items, new_items, copy=JsonPatchRules.COPY_ON_WRITE, **options)
+    changed = [
+        (segment, value) for segment, value in result.data.items()
+        if segment not in old_items or value is not old_items[segment]
+    ]
+    result.data = None
+    return (changed, result, collector.totals if collector is not None else None)
+
+
+def patch_rules(rules: List[str], **options: Any) -> JsonPatchRules:
+    return JsonPatchRules(rules, **options)
+
+
+default_registry = RuleRegistry()
+
+
+def shared_patch_rules(rules: List[str], **options: Any) -> JsonPatchRules:
+    """ Same as patch_rules, but equal rule lists share one instance of default_registry. """
+    return default_registry.get(rules, **options)
+
+
+def compile_rules(rules: List[str]) -> bytes:
+    """ Parses rules once into a versioned JSON artifact, see load_rules. """
+    return compiled.dumps(JsonPatchRules(rules, cache_size=0).to_compiled())
+
+
+def load_rules(artifact: Union[Dict[str, Any], str, bytes], **options: Any) -> JsonPatchRules:
+    """ Same as patch_rules, but from a compile_rules artifact, no rule is parsed or regex compiled. """
+    return JsonPatchRules.from_compiled(artifact, **options)
\ No newline at end of file
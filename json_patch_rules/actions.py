@@ -0,0 +1,26 @@
+from enum import IntFlag
+from typing import Iterable
+
+
+class Action(IntFlag):
+    SET = 1
+    REPLACE = 2
+    UNIQUE = 4
+    ADD = 8
+
+
+# plain ints, checking them is cheaper than IntFlag operations in the hot loop
+SET = int(Action.SET)
+REPLACE = int(Action.REPLACE)
+UNIQUE = int(Action.UNIQUE)
+ADD = int(Action.ADD)
+
+
+def action_flags(actions: Iterable[str]) -> int:
+    """ Bit flags of known action names, unknown names (e.g. "string") are ignored. """
+    flags = 0
+    for action in actions:
+        member = Action.__members__.get(action.upper())
+        if member is not None:
+            flags |= member
+    return flags
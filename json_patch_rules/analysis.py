@@ -0,0 +1,161 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from json_patch_rules.paths import Segment
+from json_patch_rules.trie import WILDCARD_ANY, WILDCARD_INDEX, WILDCARD_KEY, RuleTrie, TrieNode, alternatives
+
+# allowing rule equal to an earlier one (same path and actions)
+DUPLICATE = 'duplicate'
+# allowing rule that never decides, every path it matches is decided by earlier rules
+SHADOWED = 'shadowed'
+# deny rule over paths that some allowing rule allows, the allowing rule wins
+CONFLICT = 'conflict'
+# deny rule over paths that no rule allows, they are denied anyway
+REDUNDANT_DENY = 'redundant_deny'
+
+
+@dataclass
+class RuleIssue:
+    kind: str
+    index: int
+    rule: str
+    # rule that decides instead, if any
+    related: Optional[str] = None
+
+
+@dataclass
+class RuleAnalysis:
+    """ Issues found in a rule list, and minimized: the same rules without those flagged, with the same decisions. """
+    issues: List[RuleIssue] = field(default_factory=list)
+    minimized: List[str] = field(default_factory=list)
+
+
+def document_kinds(segments: Tuple[Segment, ...]) -> Tuple[type, ...]:
+    """ Types of new data whose paths a rule can match. """
+    if not segments:
+        return (dict, list, type(None))
+    first = segments[0]
+    if first == WILDCARD_ANY:
+        return (dict, list)
+    if isinstance(first, int) or first == WILDCARD_INDEX:
+        return (list,)
+    return (dict,)
+
+
+def split_segment(segment: Segment) -> Optional[List[Segment]]:
+    """ Narrower rule segments matching the same path segments together, e.g. "{*}" and "[*]" for "*". """
+    if segment == WILDCARD_ANY:
+        return [WILDCARD_KEY, WILDCARD_INDEX]
+    return alternatives(segment)
+
+
+def covering_children(node: TrieNode, segment: Segment) -> List[TrieNode]:
+    """ Children matching every path segment that segment (maybe a wildcard) matches. """
+    if split_segment(segment) is not None and segment != WILDCARD_ANY:
+        return []
+    if segment == WILDCARD_KEY:
+        candidates = (node.any_key, node.any)
+    elif segment == WILDCARD_INDEX:
+        candidates = (node.any_index, node.any)
+    elif segment == WILDCARD_ANY:
+        candidates = (node.any,)
+    else:
+        candidates = node.step(segment)
+    return [child for child in candidates if child is not None]
+
+
+def overlapping_children(node: TrieNode, segment: Segment) -> List[TrieNode]:
+    """ Children matching at least one path segment that segment matches. """
+    if segment == WILDCARD_ANY:
+        return node.children()
+    keys = alternatives(segment)
+    if keys is not None:
+        return [child for key in keys for child in node.step(key)]
+    if segment == WILDCARD_KEY:
+        candidates = list(node.keys.values()) + [node.any_key, node.any]
+    elif segment == WILDCARD_INDEX:
+        candidates = list(node.indices.values()) + [node.any_index, node.any]
+    else:
+        candidates = node.step(segment)
+    return [child for child in candidates if child is not None]
+
+
+def first_allow(allows: Sequence[Optional[Tuple[int, Any]]]) -> Optional[Tuple[int, Any]]:
+    allows = [allow for allow in allows if allow is not None]
+    return min(allows, key=lambda allow: allow[0]) if allows else None
+
+
+def covering_rule(trie: RuleTrie, segments: Tuple[Segment, ...]) -> Optional[Tuple[int, Any]]:
+    """
+    Worst (highest order) decision over the paths matched by segments, when every one of
+    them is allowed by some rule, otherwise None.
+    """
+    best = trie.root.allow
+    nodes = [trie.root]
+    for position, segment in enumerate(segments):
+        parts = split_segment(segment)
+        if parts is not None:
+            # covered when each part is, e.g. "a.*" by "a.{*}" and "a[*]", or "{x,y}" by "x" and "y"
+            covers = [covering_rule(trie, segments[:position] + (part,) + segments[position + 1:]) for part in parts]
+            if all(cover is not None for cover in covers):
+                best = first_allow([best, max(covers, key=lambda allow: allow[0])])
+        nodes = [child for node in nodes for child in covering_children(node, segment)]
+        best = first_allow([best] + [node.allow for node in nodes])
+        if not nodes:
+            break
+    return best
+
+
+def overlapping_rule(trie: RuleTrie, segments: Tuple[Segment, ...]) -> Optional[Tuple[int, Any]]:
+    """ First allowing rule matching at least one path that segments match. """
+    found = [trie.root.allow]
+    nodes = [trie.root]
+    for segment in segments:
+        nodes = [child for node in nodes for child in overlapping_children(node, segment)]
+        found.extend(node.allow for node in nodes)
+    # rules below the last node match longer paths, all of them under segments
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if node.best_below == float('inf'):
+            continue
+        found.append(node.allow)
+        stack.extend(node.children())
+    return first_allow(found)
+
+
+def analyze_rules(rules: Sequence[Any], root_rules: Dict[type, Any]) -> RuleAnalysis:
+    """
+    Static analysis of parsed rules (see JsonPatchRules.analyze). Decisions only depend on
+    the first allowing rule matching a prefix of the path and on root rules, so deny rules
+    and allowing rules covered by earlier ones never change a decision.
+    """
+    trie = RuleTrie(rules)
+    analysis = RuleAnalysis()
+    for order, rule in enumerate(rules):
+        if any(rule is root_rule for root_rule in root_rules.values()):
+            # root rules win over any other rule for their type of new data
+            analysis.minimized.append(rule.current_rule)
+            continue
+
+        kinds = document_kinds(rule.segments)
+        root_rule = next((root_rules[kind] for kind in kinds if kind in root_rules), None)
+        if rule.deny:
+            allowing = overlapping_rule(trie, rule.segments)
+            related = root_rule if root_rule is not None else (allowing[1] if allowing else None)
+            kind = CONFLICT if related is not None else REDUNDANT_DENY
+            analysis.issues.append(RuleIssue(kind, order, rule.current_rule, related.current_rule if related else None))
+            continue
+
+        if all(kind in root_rules for kind in kinds):
+            analysis.issues.append(RuleIssue(SHADOWED, order, rule.current_rule, root_rule.current_rule))
+            continue
+
+        covering = covering_rule(trie, rule.segments)
+        if covering is not None and covering[0] < order:
+            other = covering[1]
+            kind = DUPLICATE if (other.segments, other.actions) == (rule.segments, rule.actions) else SHADOWED
+            analysis.issues.append(RuleIssue(kind, order, rule.current_rule, other.current_rule))
+            continue
+
+        analysis.minimized.append(rule.current_rule)
+    return analysis
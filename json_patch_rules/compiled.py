@@ -0,0 +1,55 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+FORMAT_NAME = 'json-patch-rules'
+FORMAT_VERSION = 3
+
+# current_rule, deny, actions, parent_path, path (regex source, see trie.segments_regex), segments, target_size
+Record = Tuple[str, bool, List[str], str, str, List[Any], int]
+
+
+def rules_hash(rules: Sequence[str]) -> str:
+    """ Content hash of a rule list, equal lists (same rules in the same order) give equal hashes. """
+    return hashlib.sha256(json.dumps(list(rules), ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def content_hash(rules: Sequence[str], records: Sequence[Record]) -> str:
+    """
+    Content hash of a compiled rule set: format version, rules and their records, so a record
+    changed after compiling gives a different hash. Equal rule lists give equal hashes.
+    """
+    payload = [FORMAT_VERSION, list(rules), [list(record) for record in records]]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def pack(rules: Sequence[str], records: Sequence[Record]) -> Dict[str, Any]:
+    return {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'hash': content_hash(rules, records),
+        'rules': list(rules),
+        'records': [list(record) for record in records],
+    }
+
+
+def unpack(artifact: Union[Dict[str, Any], str, bytes]) -> Tuple[List[str], List[Record], str]:
+    """ Validates a compiled rule set (dict or its JSON text) and returns its rules, records and hash. """
+    if isinstance(artifact, (str, bytes, bytearray)):
+        artifact = json.loads(artifact)
+    if not isinstance(artifact, dict) or artifact.get('format') != FORMAT_NAME:
+        raise ValueError("Not a compiled rule set")
+    if artifact.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported compiled rule set version {artifact.get('version')!r}, expected {FORMAT_VERSION}")
+
+    rules, records = artifact['rules'], artifact['records']
+    if len(rules) != len(records) or any(record[0] != rule for rule, record in zip(rules, records)):
+        raise ValueError("Compiled rule set records don't match its rules")
+    expected_hash = content_hash(rules, records)
+    if artifact.get('hash') != expected_hash:
+        raise ValueError("Compiled rule set hash doesn't match its rules and records")
+    return (rules, records, expected_hash)
+
+
+def dumps(artifact: Dict[str, Any]) -> bytes:
+    return json.dumps(artifact, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
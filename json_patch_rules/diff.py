@@ -0,0 +1,66 @@
+from typing import Any, Generator, Tuple
+from json_patch_rules.paths import Segment, get_segment_paths
+
+# value of paths that don't exist in old data
+MISSING = object()
+
+
+def json_equal(a: Any, b: Any) -> bool:
+    """ Equality of JSON values that, unlike ==, doesn't consider 1, 1.0 and True equal. """
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return len(a) == len(b) and all(key in b and json_equal(value, b[key]) for key, value in a.items())
+    if isinstance(a, list):
+        return len(a) == len(b) and all(json_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def child_of(container: Any, segment: Segment) -> Any:
+    if isinstance(container, dict):
+        return container.get(segment, MISSING)
+    if isinstance(container, list) and isinstance(segment, int) and segment < len(container):
+        return container[segment]
+    return MISSING
+
+
+class DiffTracker:
+    """
+    Compares new data with old data while apply walks it. Unchanged values are skipped,
+    and reported in result.unchanged_paths when report_unchanged is set.
+    """
+
+    def __init__(self, old_data: Any, result: Any, report_unchanged: bool = False, report_prefixes: bool = False) -> None:
+        self.old_data = old_data
+        self.result = result
+        self.report_unchanged = report_unchanged
+        self.report_prefixes = report_prefixes
+
+    def unchanged(self, segments: Tuple[Segment, ...], value: Any, old_value: Any) -> bool:
+        # == runs in C and rejects most changes, json_equal only confirms equal values
+        if old_value is not value and (old_value is MISSING or old_value != value or not json_equal(old_value, value)):
+            return False
+        if self.report_unchanged:
+            if not isinstance(value, (dict, list)) or (self.report_prefixes and segments):
+                self.result.add_unchanged(segments)
+            else:
+                for leaf_segments, _ in get_segment_paths(value, segments):
+                    self.result.add_unchanged(leaf_segments)
+        return True
+
+    def changed_leaves(self, segments: Tuple[Segment, ...], value: Any, old_value: Any) -> Generator[Tuple[Tuple[Segment, ...], Any], None, None]:
+        """ Leaves of value that differ from old_value, the same walk as get_segment_paths. """
+        if isinstance(value, dict):
+            children = value.items()
+        elif isinstance(value, list):
+            children = enumerate(value)
+        else:
+            yield segments, value
+            return
+        for segment, child in children:
+            child_segments = segments + (segment,)
+            old_child = child_of(old_value, segment)
+            if not self.unchanged(child_segments, child, old_child):
+                yield from self.changed_leaves(child_segments, child, old_child)
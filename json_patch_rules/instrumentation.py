@@ -0,0 +1,89 @@
+import sys
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterable
+
+try:
+    from typing import Protocol
+except ImportError:  # pragma: no cover - python < 3.8
+    Protocol = object
+
+
+@dataclass
+class ApplyStats:
+    """ Measures of a single apply, times are in seconds. """
+    copy_mode: str = ''
+    copy_time: float = 0.0
+    traverse_time: float = 0.0
+    unique_time: float = 0.0
+    total_time: float = 0.0
+    # leaf decisions asked to the rule engine (cache hits included) and whole subtree checks
+    decisions: int = 0
+    prefix_checks: int = 0
+    allowed_paths: int = 0
+    denied_paths: int = 0
+    # containers copied from old data and their shallow size (sys.getsizeof)
+    objects_copied: int = 0
+    bytes_copied: int = 0
+
+    def counting(self, name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        """ Wraps func to increment the counter called name on every call. """
+        def counted(*args: Any) -> Any:
+            setattr(self, name, getattr(self, name) + 1)
+            return func(*args)
+        return counted
+
+
+class ApplyObserver(Protocol):
+    def on_apply(self, stats: ApplyStats) -> None:
+        ...
+
+
+@dataclass
+class StatsCollector:
+    """ Thread safe observer that sums the stats of every apply, export them with snapshot. """
+    applies: int = 0
+    totals: ApplyStats = field(default_factory=ApplyStats)
+    max_total_time: float = 0.0
+
+    def __post_init__(self) -> None:
+        self.lock = threading.Lock()
+
+    def on_apply(self, stats: ApplyStats) -> None:
+        with self.lock:
+            self.applies += 1
+            self.max_total_time = max(self.max_total_time, stats.total_time)
+            for name, value in asdict(stats).items():
+                if name != 'copy_mode':
+                    setattr(self.totals, name, getattr(self.totals, name) + value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """ Flat dict of counters, e.g. {"applies": 3, "decisions": 120, "traverse_time": 0.01, ...}. """
+        with self.lock:
+            totals = asdict(self.totals)
+            del totals['copy_mode']
+            return {'applies': self.applies, 'max_total_time': self.max_total_time, **totals}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.applies = 0
+            self.totals = ApplyStats()
+            self.max_total_time = 0.0
+
+
+def iter_containers(obj: Any) -> Iterable[Any]:
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            yield value
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            yield value
+            stack.extend(value)
+
+
+def count_copied(containers: Iterable[Any], stats: ApplyStats) -> None:
+    for container in containers:
+        stats.objects_copied += 1
+        stats.bytes_copied += sys.getsizeof(container)
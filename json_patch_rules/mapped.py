@@ -0,0 +1,283 @@
+import json
+import mmap
+import os
+import re
+import shutil
+import tempfile
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+from json_patch_rules.paths import Segment
+
+STRING = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+STRING_PATTERN = re.compile(STRING, re.DOTALL)
+# everything up to the next bracket outside of strings, one match per bracket
+BRACKET_PATTERN = re.compile(rb'(?:[^"\[\]{}]|' + STRING + rb')*([\[\]{}])', re.DOTALL)
+SCALAR_PATTERN = re.compile(rb'[^\s,\]}]+')
+WHITESPACE_PATTERN = re.compile(rb'\s*')
+# keeps only the brackets of a chunk, with "{" and "}" turned into "[" and "]"
+BRACKETS = bytes.maketrans(b'{}', b'[]')
+NOT_BRACKETS = bytes(byte for byte in range(256) if byte not in b'[]{}')
+
+# bytes copied at once from the mapped file when writing untouched values
+COPY_CHUNK_SIZE = 1 << 20
+# bytes of a container checked at once when looking for its end, doubled up to the max
+MIN_SCAN_SIZE = 1 << 12
+MAX_SCAN_SIZE = 1 << 22
+
+
+class RawJson:
+    """
+    A value of a mapped document left unparsed. apply treats it as an opaque leaf, it is
+    only parsed when compared or hashed (e.g. by unique) and written back byte for byte.
+    """
+
+    __slots__ = ('document', 'start', 'end')
+
+    def __init__(self, document: 'MappedDocument', start: int, end: int) -> None:
+        self.document = document
+        self.start = start
+        self.end = end
+
+    def value(self) -> Any:
+        return self.document.load(self.start, self.end)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, RawJson):
+            if (other.document, other.start, other.end) == (self.document, self.start, self.end):
+                return True
+            other = other.value()
+        return self.value() == other
+
+    def __hash__(self) -> int:
+        from json_patch_rules import freeze
+        return hash(freeze(self.value()))
+
+    def __repr__(self) -> str:
+        return f"RawJson(start={self.start!r}, end={self.end!r})"
+
+
+class MappedDocument:
+    """
+    Read only JSON file mapped in memory. view(new_data) parses only the containers of the
+    file along the paths of new_data, everything else stays as RawJson byte ranges, and
+    save writes a patched view back copying untouched byte ranges as they are.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = open(path, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        # containers built by view with their byte range, by id (they're kept alive here)
+        self.containers: Dict[int, Tuple[Any, int, int]] = {}
+
+    def __enter__(self) -> 'MappedDocument':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.containers.clear()
+        if not self.buffer.closed:
+            self.buffer.close()
+        self.file.close()
+
+    def skip_whitespace(self, position: int) -> int:
+        return WHITESPACE_PATTERN.match(self.buffer, position).end()
+
+    def value_end(self, start: int) -> int:
+        """ End of the value starting at start, nested values are skipped without being parsed. """
+        first = self.buffer[start:start + 1]
+        if first == b'"':
+            return STRING_PATTERN.match(self.buffer, start).end()
+        if first not in (b'{', b'['):
+            return SCALAR_PATTERN.match(self.buffer, start).end()
+        return self.container_end(start)
+
+    def container_end(self, start: int) -> int:
+        """
+        End of the container starting at start. The file is read in chunks that start and end
+        outside strings. Once strings are dropped, removing every "[]" pair of a chunk leaves
+        the brackets closing enclosing containers followed by the ones left open, so a chunk
+        is skipped with a few C level passes unless it closes the container, and only that
+        chunk is scanned bracket by bracket.
+        """
+        buffer = self.buffer
+        depth = 1
+        position = start + 1
+        size = MIN_SCAN_SIZE
+        while position < len(buffer):
+            end = min(position + size, len(buffer))
+            while end < len(buffer) and buffer[end - 1] == ord('\\'):
+                # don't split an escape
+                end += 1
+            chunk = self.unescaped(position, end)
+            if chunk.count(b'"') % 2:
+                # the chunk ends inside a string, stop before its opening quote
+                end = self.last_quote(position, end)
+                if end == position:
+                    # the chunk is a single long string
+                    string = STRING_PATTERN.match(buffer, position)
+                    if string is None:
+                        break
+                    end = string.end()
+                chunk = self.unescaped(position, end)
+            # once escapes are removed, every other part between quotes is outside strings
+            outside = b''.join(chunk.split(b'"')[::2])
+            brackets = outside.translate(BRACKETS, NOT_BRACKETS)
+            while True:
+                unmatched = brackets.replace(b'[]', b'')
+                if len(unmatched) == len(brackets):
+                    break
+                brackets = unmatched
+            closes = brackets.count(b']')
+            if closes < depth:
+                depth += len(brackets) - 2 * closes
+                position = end
+                size = min(size * 2, MAX_SCAN_SIZE)
+                continue
+            if size > MIN_SCAN_SIZE:
+                size = MIN_SCAN_SIZE
+                continue
+            for token in BRACKET_PATTERN.finditer(buffer, position, end):
+                if token.group(1) in b'{[':
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        return token.end()
+            position = end
+        raise ValueError(f"Unterminated JSON container at byte {start}")
+
+    def unescaped(self, start: int, end: int) -> bytes:
+        """ Bytes between start and end without escaped backslashes and quotes, end can't split an escape. """
+        chunk = self.buffer[start:end]
+        if b'\\' not in chunk:
+            return chunk
+        # pairs are removed left to right, like escapes are read
+        return chunk.replace(b'\\\\', b'').replace(b'\\"', b'')
+
+    def last_quote(self, start: int, end: int) -> int:
+        """ Position of the last quote between start and end that isn't escaped, or start. """
+        quote = self.buffer.rfind(b'"', start, end)
+        while quote > start:
+            backslashes = quote
+            while backslashes > start and self.buffer[backslashes - 1] == ord('\\'):
+                backslashes -= 1
+            if (quote - backslashes) % 2 == 0:
+                return quote
+            quote = self.buffer.rfind(b'"', start, quote)
+        return start
+
+    def iter_children(self, start: int) -> Iterator[Tuple[Segment, int, int]]:
+        """ (key or index, start, end) of every child of the container starting at start. """
+        is_object = self.buffer[start:start + 1] == b'{'
+        position = self.skip_whitespace(start + 1)
+        index = 0
+        while self.buffer[position:position + 1] not in (b'}', b']'):
+            if is_object:
+                key_end = STRING_PATTERN.match(self.buffer, position).end()
+                segment: Segment = json.loads(self.buffer[position:key_end])
+                position = self.skip_whitespace(self.skip_whitespace(key_end) + 1)
+            else:
+                segment = index
+                index += 1
+            end = self.value_end(position)
+            yield (segment, position, end)
+            position = self.skip_whitespace(end)
+            if self.buffer[position:position + 1] == b',':
+                position = self.skip_whitespace(position + 1)
+
+    def load(self, start: int, end: int) -> Any:
+        return json.loads(self.buffer[start:end])
+
+    def view(self, new_data: Any) -> Any:
+        """ Old data to apply new_data to: containers along the paths of new_data, RawJson elsewhere. """
+        start = self.skip_whitespace(0)
+        # the root ends at the last byte that isn't whitespace, no need to scan for it
+        end = len(self.buffer)
+        while end > start and self.buffer[end - 1:end].isspace():
+            end -= 1
+        return self.build(start, end, new_data)
+
+    def build(self, start: int, end: int, new_data: Any) -> Any:
+        first = self.buffer[start:start + 1]
+        if first not in (b'{', b'['):
+            return self.load(start, end)
+        if first == b'{' and not isinstance(new_data, (dict, list)):
+            # replaced by a leaf of new data, never read (arrays are kept for unique appends)
+            return RawJson(self, start, end)
+
+        container: Any = {} if first == b'{' else []
+        for segment, child_start, child_end in self.iter_children(start):
+            if isinstance(new_data, dict):
+                has_child = segment in new_data
+            else:
+                has_child = isinstance(new_data, list) and isinstance(segment, int) and segment < len(new_data)
+            if has_child:
+                child = self.build(child_start, child_end, new_data[segment])
+            else:
+                child = RawJson(self, child_start, child_end)
+            if isinstance(container, dict):
+                container[segment] = child
+            else:
+                container.append(child)
+        self.containers[id(container)] = (container, start, end)
+        return container
+
+    def copy_range(self, start: int, end: int, output: BinaryIO) -> None:
+        for offset in range(start, end, COPY_CHUNK_SIZE):
+            output.write(self.buffer[offset:min(offset + COPY_CHUNK_SIZE, end)])
+
+    def dump(self, value: Any, output: BinaryIO) -> None:
+        """ Writes value (a view patched by apply with copy="cow") as JSON bytes. """
+        if isinstance(value, RawJson) and value.document is self:
+            self.copy_range(value.start, value.end, output)
+            return
+        original = self.containers.get(id(value))
+        if original is not None and original[0] is value:
+            # copy on write leaves every container along a modified path copied
+            self.copy_range(original[1], original[2], output)
+            return
+
+        if isinstance(value, dict):
+            output.write(b'{')
+            for position, (key, child) in enumerate(value.items()):
+                if position:
+                    output.write(b', ')
+                output.write(json.dumps(key if isinstance(key, str) else str(key)).encode() + b': ')
+                self.dump(child, output)
+            output.write(b'}')
+        elif isinstance(value, list):
+            output.write(b'[')
+            for position, child in enumerate(value):
+                if position:
+                    output.write(b', ')
+                self.dump(child, output)
+            output.write(b']')
+        elif isinstance(value, RawJson):
+            output.write(json.dumps(value.value()).encode())
+        else:
+            output.write(json.dumps(value).encode())
+
+    def save(self, value: Any, path: Optional[str] = None) -> None:
+        """
+        Writes value to path, or atomically replaces the mapped file when path is None (the
+        document is closed afterwards).
+        """
+        if path is not None:
+            with open(path, 'wb') as output:
+                self.dump(value, output)
+            return
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile('wb', dir=directory, delete=False) as output:
+            try:
+                self.dump(value, output)
+            except BaseException:
+                output.close()
+                os.unlink(output.name)
+                raise
+        # the temporary file is created 0600, keep the permissions of the file it replaces
+        shutil.copymode(self.path, output.name)
+        self.close()
+        os.replace(output.name, self.path)
@@ -0,0 +1,88 @@
+import copy
+from typing import Any, Dict, Iterable, List, Tuple
+from json_patch_rules.paths import Segment
+from json_patch_rules.writer import DocumentWriter
+
+Operation = Dict[str, Any]
+
+# last token of an "add" to append to an array
+APPEND_TOKEN = '-'
+
+
+def format_pointer(segments: Tuple[Segment, ...]) -> str:
+    """ RFC 6901 JSON pointer of segments, e.g. ("user", "contacts", 0) -> "/user/contacts/0". """
+    return ''.join('/' + str(segment).replace('~', '~0').replace('/', '~1') for segment in segments)
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    if pointer == '':
+        return []
+    if not pointer.startswith('/'):
+        raise ValueError(f"Invalid JSON pointer {pointer!r}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def operation(op: str, segments: Tuple[Segment, ...], value: Any = None) -> Operation:
+    """ An RFC 6902 operation, values are copied so later changes to the document don't leak into it. """
+    if op == 'remove':
+        return {'op': op, 'path': format_pointer(segments)}
+    if isinstance(value, (dict, list)):
+        value = copy.deepcopy(value)
+    return {'op': op, 'path': format_pointer(segments), 'value': value}
+
+
+def resolve(container: Any, token: str, op: str) -> Segment:
+    """ Segment of token in container, array indices are converted to int. """
+    if isinstance(container, dict):
+        return token
+    if not isinstance(container, list):
+        raise ValueError(f"Can't apply {op!r} below a {type(container).__name__}")
+    if token == APPEND_TOKEN and op == 'add':
+        return len(container)
+    if not token.isdigit() or (token != '0' and token.startswith('0')):
+        raise ValueError(f"Invalid array index {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and op != 'add'):
+        raise ValueError(f"Array index {index} out of range")
+    return index
+
+
+def apply_ops(doc: Any, ops: Iterable[Operation], in_place: bool = False) -> Any:
+    """
+    Replays "add", "replace" and "remove" operations (e.g. ResultData.operations) without
+    checking any rule. Unless in_place, only the containers along changed paths are copied
+    and doc itself isn't modified. Always use the returned document.
+    """
+    writer = DocumentWriter(doc, copy_on_write=not in_place)
+    for op in ops:
+        name = op['op']
+        if name not in ('add', 'replace', 'remove'):
+            raise ValueError(f"Unsupported operation {name!r}")
+        tokens = parse_pointer(op['path'])
+        value = copy.deepcopy(op['value']) if name != 'remove' else None
+        if not tokens:
+            if name == 'remove':
+                raise ValueError("Can't remove the root document")
+            writer.root = value
+            continue
+
+        segments: Tuple[Segment, ...] = ()
+        parent = writer.root
+        for token in tokens[:-1]:
+            segment = resolve(parent, token, 'replace')
+            if isinstance(parent, dict) and segment not in parent:
+                raise ValueError(f"Path {op['path']!r} doesn't exist")
+            segments += (segment,)
+            parent = parent[segment]
+
+        segment = resolve(parent, tokens[-1], name)
+        if isinstance(parent, dict) and name != 'add' and segment not in parent:
+            raise ValueError(f"Path {op['path']!r} doesn't exist")
+        parent = writer.get_container(segments)
+        if name == 'remove':
+            del parent[segment]
+        elif name == 'add' and isinstance(parent, list):
+            parent.insert(segment, value)
+        else:
+            parent[segment] = value
+    return writer.root
@@ -1,3 +1,12 @@
+import re
+from typing import Any, Generator, Tuple, Union
+
+Segment = Union[str, int]
+
+PATH_SEGMENT_PATTERN = re.compile(r'\[(\d+)\]|([^.\[\]]+)')
+RULE_SEGMENT_PATTERN = re.compile(r'\[(\*|\d+)\]|([^.\[\]]+)')
+
+
 def get_paths(obj, current_path=""):
     """ Recursively find all paths in a nested JSON object and format them in dot and bracket notation. """
     if isinstance(obj, dict):
@@ -10,3 +19,86 @@ def get_paths(obj, current_path=""):
             yield from get_paths(v, new_path)
     else:
         yield current_path
+
+
+def parse_path(path: str) -> Tuple[Segment, ...]:
+    """ Split a dot and bracket notation path (e.g. "user.contacts[0].label") into key and index segments. """
+    return tuple(int(index) if index else key for index, key in PATH_SEGMENT_PATTERN.findall(path))
+
+
+def parse_rule_path(path: str) -> Tuple[Segment, ...]:
+    """ Same as parse_path, but keeps "[*]", "{*}" and "*" as wildcard segments. """
+    segments = []
+    for index, key in RULE_SEGMENT_PATTERN.findall(path):
+        if index == '*':
+            segments.append('[*]')
+        elif index:
+            segments.append(int(index))
+        else:
+            segments.append(key)
+    return tuple(segments)
+
+
+def format_path(segments: Tuple[Segment, ...]) -> str:
+    """ Inverse of parse_path, it builds the same notation produced by get_paths. """
+    path = ""
+    for segment in segments:
+        if isinstance(segment, int):
+            path = f"{path}[{segment}]"
+        else:
+            path = f"{path}.{segment}" if path else segment
+    return path
+
+
+def format_pattern(segments: Tuple[Segment, ...]) -> str:
+    """ Same as format_path, with every index as "[*]", e.g. "items[*].price". """
+    path = ""
+    for segment in segments:
+        if isinstance(segment, int):
+            path = f"{path}[*]"
+        else:
+            path = f"{path}.{segment}" if path else segment
+    return path
+
+
+def get_segment_paths(obj: Any, prefix: Tuple[Segment, ...] = ()) -> Generator[Tuple[Tuple[Segment, ...], Any], None, None]:
+    """ Same walk as get_paths, but it yields (segments, value) for every leaf instead of formatted strings. """
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            yield from get_segment_paths(v, prefix + (k,))
+    elif isinstance(obj, list):
+        for i, v in enumerate(obj):
+            yield from get_segment_paths(v, prefix + (i,))
+    else:
+        yield prefix, obj
+
+
+def get_in(obj: Any, segments: Tuple[Segment, ...], default: Any = None) -> Any:
+    for segment in segments:
+        if isinstance(obj, dict):
+            if segment not in obj:
+                return default
+            obj = obj[segment]
+        elif isinstance(obj, list) and isinstance(segment, int):
+            if segment >= len(obj):
+                return default
+            obj = obj[segment]
+        else:
+            return default
+    return obj
+
+
+def new_container(segment: Segment) -> Any:
+    return [] if isinstance(segment, int) else {}
+
+
+def put(container: Any, segment: Segment, value: Any) -> None:
+    if isinstance(container, list):
+        if segment >= len(container):
+            container.extend([None] * (segment + 1 - len(container)))
+    container[segment] = value
+
+
+def fits(container: Any, segment: Segment) -> bool:
+    return isinstance(container, dict) or (isinstance(container, list) and isinstance(segment, int))
+
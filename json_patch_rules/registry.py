@@ -0,0 +1,123 @@
+import inspect
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable, Optional, Sequence, Tuple
+
+from json_patch_rules.compiled import rules_hash
+
+
+@dataclass
+class RegistryStats:
+    hits: int
+    misses: int
+    evictions: int
+    compile_time: float
+    size: int
+    rules: int
+    shared_rules: int
+
+
+class RuleRegistry:
+    """
+    Thread safe LRU registry of compiled rule sets. Equal rule lists (and options) share
+    one instance, and equal rules share one parsed RuleItem across every rule set.
+
+    max_size bounds the number of rule sets and max_rules (optional) the total number of
+    rules they hold, least recently used rule sets are evicted first.
+
+    Options are keyed with their defaults filled in, except observer: it isn't part of the
+    key and, when given, the caller gets its own handle over the shared rule set (see
+    JsonPatchRules.with_observer), the shared instance is never changed.
+    """
+
+    UNKEYED_OPTIONS = ('observer',)
+
+    def __init__(self, max_size: int = 256, max_rules: Optional[int] = None, factory: Any = None) -> None:
+        if factory is None:
+            from json_patch_rules import JsonPatchRules as factory
+        self.factory = factory
+        self.signature = inspect.signature(factory)
+        self.max_size = max_size
+        self.max_rules = max_rules
+        self.entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        # parsed rules by rule string, alive as long as a registered rule set uses them
+        self.rule_items: 'weakref.WeakValueDictionary[str, Any]' = weakref.WeakValueDictionary()
+        self.rule_count = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compile_time = 0.0
+        self.lock = threading.Lock()
+
+    def key(self, rules: Sequence[str], options: dict) -> Tuple[str, Tuple[Any, ...]]:
+        """ Key of a rule list and its options, raises TypeError for an unknown option. """
+        bound = self.signature.bind(rules, **options)
+        bound.apply_defaults()
+        arguments = list(bound.arguments.items())[1:]
+        return (rules_hash(rules), tuple((name, value) for name, value in arguments if name not in self.UNKEYED_OPTIONS))
+
+    def get(self, rules: Sequence[str], **options: Any) -> Any:
+        """ Returns the rule set of the given rules, compiling it on the first call. """
+        observer = options.pop('observer', None)
+        key = self.key(rules, options)
+        with self.lock:
+            patch = self.entries.get(key)
+            if patch is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+                start = time.perf_counter()
+                patch = self.compile(list(rules), dict(key[1]))
+                self.compile_time += time.perf_counter() - start
+
+                self.entries[key] = patch
+                self.rule_count += len(patch.rules)
+                self.evict()
+        if observer is not None:
+            return patch.with_observer(observer)
+        return patch
+
+    def compile(self, rules: Sequence[str], options: dict) -> Any:
+        patch = self.factory.__new__(self.factory)
+        rule_items = []
+        for rule in rules:
+            rule_item = self.rule_items.get(rule)
+            if rule_item is None:
+                rule_item = patch.parse_rule(rule)
+                self.rule_items[rule] = rule_item
+            rule_items.append(rule_item)
+        patch.setup(list(rules), rule_items, **options)
+        return patch
+
+    def evict(self) -> None:
+        # the newest entry is always kept, even if it exceeds max_rules by itself
+        while len(self.entries) > 1 and (
+            len(self.entries) > self.max_size
+            or (self.max_rules is not None and self.rule_count > self.max_rules)
+        ):
+            _, patch = self.entries.popitem(last=False)
+            self.rule_count -= len(patch.rules)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.rule_count = 0
+            self.hits = self.misses = self.evictions = 0
+            self.compile_time = 0.0
+
+    def stats(self) -> RegistryStats:
+        with self.lock:
+            return RegistryStats(
+                self.hits,
+                self.misses,
+                self.evictions,
+                self.compile_time,
+                len(self.entries),
+                self.rule_count,
+                len(self.rule_items),
+            )
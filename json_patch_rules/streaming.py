@@ -0,0 +1,281 @@
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - optional faster backend
+    ijson = None
+
+from json_patch_rules.__symbols__ import EMPTY_ARRAY_SYMBOL
+from json_patch_rules.actions import REPLACE
+from json_patch_rules.paths import Segment
+
+Chunk = Union[str, bytes]
+Event = Tuple[str, Any]
+
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?')
+NUMBER_CHARS = re.compile(r'[-+0-9.eE]+')
+LITERALS = {'t': ('true', True), 'f': ('false', False), 'n': ('null', None)}
+
+
+def iter_chunks(stream: Any, chunk_size: int = CHUNK_SIZE) -> Iterator[Chunk]:
+    """ Chunks of a file-like object, a whole str/bytes document or an iterator of chunks. """
+    if hasattr(stream, 'read'):
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    elif isinstance(stream, (str, bytes, bytearray)):
+        yield stream
+    else:
+        yield from stream
+
+
+def iter_tokens(chunks: Iterable[Chunk]) -> Iterator[Any]:
+    """ Incremental JSON tokenizer, structural characters are yielded as is and values as ('value', value). """
+    chunks = iter(chunks)
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            text = decoder.decode(b'', final=True)
+        else:
+            text = chunk if isinstance(chunk, str) else decoder.decode(chunk)
+        buffer = buffer[pos:] + text
+        pos = 0
+        return True
+
+    while True:
+        pos = WHITESPACE.match(buffer, pos).end()
+        if pos >= len(buffer):
+            if fill():
+                continue
+            return
+
+        char = buffer[pos]
+        if char in '{}[]:,':
+            pos += 1
+            yield char
+        elif char == '"':
+            try:
+                value, end = json.decoder.scanstring(buffer, pos + 1)
+            except json.JSONDecodeError:
+                # the string (or one of its escapes) continues in the next chunk
+                if fill():
+                    continue
+                raise
+            pos = end
+            yield ('value', value)
+        elif char == '-' or char.isdigit():
+            end = NUMBER_CHARS.match(buffer, pos).end()
+            if end == len(buffer) and fill():
+                continue
+            match = NUMBER.match(buffer, pos)
+            if match is None or match.end() != end:
+                raise ValueError(f"Invalid JSON number at position {pos}")
+            fraction, exponent = match.group(1), match.group(2)
+            number = match.group(0)
+            pos = end
+            yield ('value', float(number) if fraction or exponent else int(number))
+        elif char in LITERALS:
+            literal, value = LITERALS[char]
+            if len(buffer) - pos < len(literal) and fill():
+                continue
+            if buffer[pos:pos + len(literal)] != literal:
+                raise ValueError(f"Invalid JSON literal at position {pos}")
+            pos += len(literal)
+            yield ('value', value)
+        else:
+            raise ValueError(f"Unexpected character {char!r} at position {pos}")
+
+
+def basic_parse(chunks: Iterable[Chunk]) -> Iterator[Event]:
+    """
+    Stdlib only JSON event parser, it yields the same events as ijson.basic_parse:
+    start_map, map_key, end_map, start_array, end_array and ('value', value) for scalars.
+    Raises ValueError on anything that isn't exactly one JSON document, e.g. a missing
+    comma or colon, a non string key, a truncated document or a second root value.
+    """
+    stack: List[str] = []
+    # what the next token can be: a value (or a key in a map) and whether the container may close
+    expect = 'value'
+    can_close = False
+    done = False
+    for token in iter_tokens(chunks):
+        if done:
+            raise ValueError(f"Unexpected {describe(token)} after the end of the JSON document")
+        if token == '}' or token == ']':
+            expected = 'map' if token == '}' else 'array'
+            if not can_close or stack[-1] != expected:
+                raise ValueError(f"Unexpected {token!r}")
+            stack.pop()
+            yield ('end_map' if token == '}' else 'end_array', None)
+        elif token == ',':
+            if expect != 'comma':
+                raise ValueError("Unexpected ','")
+            expect = 'key' if stack[-1] == 'map' else 'value'
+            can_close = False
+            continue
+        elif token == ':':
+            if expect != 'colon':
+                raise ValueError("Unexpected ':'")
+            expect = 'value'
+            continue
+        elif expect == 'key':
+            if not (isinstance(token, tuple) and isinstance(token[1], str)):
+                raise ValueError(f"Expected a string key, got {describe(token)}")
+            expect = 'colon'
+            can_close = False
+            yield ('map_key', token[1])
+            continue
+        elif expect != 'value':
+            raise ValueError(f"Expected {expect!r}, got {describe(token)}")
+        elif token == '{' or token == '[':
+            stack.append('map' if token == '{' else 'array')
+            expect = 'key' if token == '{' else 'value'
+            can_close = True
+            yield ('start_map' if token == '{' else 'start_array', None)
+            continue
+        else:
+            yield token
+
+        # a value (scalar or container) just ended
+        done = not stack
+        expect = 'comma'
+        can_close = True
+
+    if stack or not done:
+        raise ValueError("Unexpected end of JSON document")
+
+
+def describe(token: Any) -> str:
+    return repr(token[1]) if isinstance(token, tuple) else repr(token)
+
+
+def iter_events(stream: Any, backend: Optional[str] = None) -> Iterator[Event]:
+    """ backend is "ijson", "python" or None to use ijson when it is installed and stream is file-like. """
+    use_ijson = backend == 'ijson' or (backend is None and ijson is not None and hasattr(stream, 'read'))
+    if not use_ijson:
+        yield from basic_parse(iter_chunks(stream))
+        return
+
+    if ijson is None:
+        raise ImportError("ijson backend requested but ijson is not installed")
+    for event, value in ijson.basic_parse(stream, use_float=True):
+        if event in ('string', 'number', 'boolean', 'null'):
+            yield ('value', value)
+        else:
+            yield (event, value)
+
+
+class StreamFrame:
+    __slots__ = ('segments', 'value', 'index', 'key')
+
+    def __init__(self, segments: Tuple[Segment, ...], value: Any) -> None:
+        # value is the container being built, or None when it isn't captured
+        self.segments = segments
+        self.value = value
+        self.index = 0
+        self.key: Any = None
+
+    def child_segment(self) -> Segment:
+        return self.index if self.key is None else self.key
+
+    def attach(self, segment: Segment, value: Any) -> None:
+        if self.value is None:
+            return
+        if isinstance(self.value, list):
+            self.value.append(value)
+        else:
+            self.value[segment] = value
+
+
+def apply_events(patch: Any, result: Any, writer: Any, events: Iterable[Event]) -> None:
+    """
+    Applies new data given as parser events. Only subtrees that can be the target of a
+    replace rule are built in memory, every other leaf is checked and assigned as it arrives.
+    """
+    actions_data: Dict[str, Dict[Tuple[Segment, ...], Any]] = {"unique": {}}
+    stack: List[StreamFrame] = []
+    pending_replaces = set()
+    kind_sample: Any = None
+    root_value: Any = None
+    has_leaves = False
+
+    def replace(target: Tuple[Segment, ...]) -> None:
+        pending_replaces.add(target)
+
+    def should_capture(segments: Tuple[Segment, ...]) -> bool:
+        if not segments:
+            root_rule = patch.get_root_rule(kind_sample)
+            if root_rule is not None and root_rule.flags & REPLACE:
+                return True
+        return any(rule.flags & REPLACE for rule in patch.trie.match_targets(segments))
+
+    def next_value_segments() -> Tuple[Segment, ...]:
+        if not stack:
+            return ()
+        frame = stack[-1]
+        return frame.segments + (frame.child_segment(),)
+
+    def close_value(segments: Tuple[Segment, ...], value: Any) -> None:
+        nonlocal root_value
+        if segments in pending_replaces:
+            pending_replaces.discard(segments)
+            writer.set(segments, value)
+        if stack:
+            frame = stack[-1]
+            frame.attach(segments[-1], value)
+            if frame.key is None:
+                frame.index += 1
+            else:
+                frame.key = None
+        else:
+            root_value = value
+
+    for event, value in events:
+        if event in ('start_map', 'start_array'):
+            segments = next_value_segments()
+            if not stack:
+                kind_sample = {} if event == 'start_map' else []
+            parent_captured = bool(stack) and stack[-1].value is not None
+            captured = parent_captured or should_capture(segments)
+            container = ({} if event == 'start_map' else []) if captured else None
+            stack.append(StreamFrame(segments, container))
+        elif event == 'map_key':
+            stack[-1].key = value
+        elif event in ('end_map', 'end_array'):
+            frame = stack.pop()
+            close_value(frame.segments, frame.value)
+        else:
+            has_leaves = True
+            segments = next_value_segments()
+            decision = patch.decide(segments, kind_sample)
+            patch.apply_path(result, writer, actions_data, segments, value, decision, replace)
+            close_value(segments, value)
+
+    if not has_leaves:
+        if root_value is None:
+            root_value = kind_sample
+
+        def replace_root(target: Tuple[Segment, ...]) -> None:
+            writer.set(target, root_value)
+
+        decision = patch.decide((), kind_sample)
+        patch.apply_path(result, writer, actions_data, (), EMPTY_ARRAY_SYMBOL, decision, replace_root)
+
+    patch.finish(result, writer, actions_data)
@@ -0,0 +1,217 @@
+import re
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from dataclasses import dataclass, field
+from json_patch_rules.paths import Segment
+
+WILDCARD_KEY = '{*}'
+WILDCARD_INDEX = '[*]'
+WILDCARD_ANY = '*'
+
+# limits of a single rule, so untrusted rules can't make the trie (and every lookup) blow up
+MAX_RULE_SEGMENTS = 64
+MAX_RULE_EXPANSIONS = 256
+
+
+def alternatives(segment: Segment) -> Optional[List[str]]:
+    """ Keys of an alternation segment like "{label,phone}", or None for any other segment. """
+    if not isinstance(segment, str) or segment == WILDCARD_KEY or not (segment.startswith('{') and segment.endswith('}')):
+        return None
+    keys = [key.strip() for key in segment[1:-1].split(',')]
+    if not all(keys):
+        raise ValueError(f"Empty key in alternation {segment!r}")
+    return keys
+
+
+def check_complexity(rule: Any) -> None:
+    """ Raises ValueError when rule has more segments or alternation expansions than allowed. """
+    if len(rule.segments) > MAX_RULE_SEGMENTS:
+        raise ValueError(f"Rule {rule.current_rule!r} has more than {MAX_RULE_SEGMENTS} segments")
+    expansions = 1
+    for segment in rule.segments:
+        keys = alternatives(segment)
+        expansions *= len(keys) if keys is not None else 1
+        if expansions > MAX_RULE_EXPANSIONS:
+            raise ValueError(f"Rule {rule.current_rule!r} expands to more than {MAX_RULE_EXPANSIONS} paths")
+
+
+
+def segments_regex(segments: Sequence[Segment]) -> str:
+    """
+    Regex source matching the formatted paths (see paths.format_path) that start with a path
+    matched by segments. Segments are delimited by "." and "[", so it never backtracks.
+    """
+    KEY = r'[^.\[\]]+'
+    INDEX = r'\[\d+\]'
+    parts = ['^']
+    for position, segment in enumerate(segments):
+        dot = r'\.' if position else ''
+        keys = alternatives(segment)
+        if keys is not None:
+            parts.append(dot + '(?:' + '|'.join(re.escape(key) for key in keys) + ')')
+        elif segment == WILDCARD_KEY:
+            parts.append(dot + KEY)
+        elif segment == WILDCARD_INDEX:
+            parts.append(INDEX)
+        elif segment == WILDCARD_ANY:
+            parts.append(f'(?:{INDEX}|{dot}{KEY})')
+        elif isinstance(segment, int):
+            parts.append(rf'\[{segment}\]')
+        else:
+            parts.append(dot + re.escape(segment))
+    # a match must end at a segment boundary, "user" doesn't match "username"
+    parts.append(r'(?=$|[.\[])')
+    return ''.join(parts)
+
+@dataclass
+class TrieNode:
+    keys: Dict[str, 'TrieNode'] = field(default_factory=dict)
+    indices: Dict[int, 'TrieNode'] = field(default_factory=dict)
+    any_key: Optional['TrieNode'] = None
+    any_index: Optional['TrieNode'] = None
+    any: Optional['TrieNode'] = None
+    # (rule order, rule) of the first allowing / denying rule ending at this node
+    allow: Optional[Tuple[int, Any]] = None
+    deny: Optional[Tuple[int, Any]] = None
+    # lowest allowing rule order in this node or any descendant, used to stop walking early
+    best_below: float = float('inf')
+
+    def child(self, segment: Segment) -> 'TrieNode':
+        """ Child of a rule segment, created if missing. Alternations are expanded by RuleTrie.insert. """
+        if segment == WILDCARD_KEY:
+            if self.any_key is None:
+                self.any_key = TrieNode()
+            return self.any_key
+        if segment == WILDCARD_INDEX:
+            if self.any_index is None:
+                self.any_index = TrieNode()
+            return self.any_index
+        if segment == WILDCARD_ANY:
+            if self.any is None:
+                self.any = TrieNode()
+            return self.any
+        children = self.indices if isinstance(segment, int) else self.keys
+        if segment not in children:
+            children[segment] = TrieNode()
+        return children[segment]
+
+    def children(self) -> List['TrieNode']:
+        nodes = list(self.keys.values()) + list(self.indices.values())
+        return nodes + [node for node in (self.any_key, self.any_index, self.any) if node is not None]
+
+    def kind_children(self, kind: type, wildcards_only: bool = False) -> List['TrieNode']:
+        """ Children that can match a child of a container of kind (dict or list). """
+        if kind is dict:
+            nodes = [self.any_key, self.any] + ([] if wildcards_only else list(self.keys.values()))
+        else:
+            nodes = [self.any_index, self.any] + ([] if wildcards_only else list(self.indices.values()))
+        return [node for node in nodes if node is not None]
+
+    def step(self, segment: Segment) -> List['TrieNode']:
+        if isinstance(segment, int):
+            candidates = (self.indices.get(segment), self.any_index, self.any)
+        else:
+            candidates = (self.keys.get(segment), self.any_key, self.any)
+        return [node for node in candidates if node is not None]
+
+
+class RuleTrie:
+    """
+    Segment trie of parsed rules. A rule matches a path when its segments match a prefix
+    of the path segments, and the decision is the first allowing rule in declaration order.
+
+    Alternations ("{label,phone}") are expanded into one branch per key when rules are
+    inserted, so a lookup never backtracks: each path segment is matched once against the
+    children of the nodes reached so far, which is at most one node per rule.
+    """
+
+    def __init__(self, rules: Sequence[Any] = ()) -> None:
+        self.root = TrieNode()
+        # positions of literal index segments ("[0]") in any rule
+        self.literal_index_positions: Set[int] = set()
+        for order, rule in enumerate(rules):
+            self.insert(order, rule)
+
+    def insert(self, order: int, rule: Any) -> None:
+        check_complexity(rule)
+        nodes = [self.root]
+        visited = [self.root]
+        for position, segment in enumerate(rule.segments):
+            if isinstance(segment, int):
+                self.literal_index_positions.add(position)
+            keys = alternatives(segment)
+            if keys is None:
+                nodes = [node.child(segment) for node in nodes]
+            else:
+                # alternation keys are always literal, even "*"
+                nodes = [node.keys.setdefault(key, TrieNode()) for node in nodes for key in keys]
+            visited.extend(nodes)
+
+        for node in nodes:
+            if rule.deny:
+                if node.deny is None:
+                    node.deny = (order, rule)
+                continue
+            if node.allow is None or order < node.allow[0]:
+                node.allow = (order, rule)
+        if rule.deny:
+            return
+        for parent in visited:
+            parent.best_below = min(parent.best_below, order)
+
+    def walk(self, segments: Sequence[Segment]) -> Tuple[Optional[Tuple[int, Any]], List[TrieNode]]:
+        """
+        Returns the best allowing (order, rule) matching a prefix of segments and the nodes
+        still able to match longer paths (empty when no deeper rule could do better).
+        """
+        best = self.root.allow
+        nodes = [self.root]
+        for segment in segments:
+            limit = best[0] if best else float('inf')
+            next_nodes = []
+            for node in nodes:
+                for child in node.step(segment):
+                    if child.best_below >= limit:
+                        continue
+                    if child.allow is not None and child.allow[0] < limit:
+                        best = child.allow
+                        limit = best[0]
+                    next_nodes.append(child)
+            nodes = next_nodes
+            if not nodes:
+                break
+        return (best, nodes)
+
+    def lookup(self, segments: Sequence[Segment]) -> Optional[Any]:
+        best, _ = self.walk(segments)
+        return best[1] if best else None
+
+    def lookup_prefix(self, segments: Sequence[Segment], kind: Optional[type] = None) -> Tuple[bool, Optional[Any]]:
+        """
+        Decides a whole subtree: (True, rule) when every path starting with segments is
+        decided by the same rule (None meaning denied), otherwise (False, None). kind (dict
+        or list) is the type of the container at segments, when known: its children can
+        only be keys or only indices, so "{*}" or "[*]" children match every one of them.
+        """
+        best, nodes = self.walk(segments)
+        if kind is not None:
+            for node in nodes:
+                for child in node.kind_children(kind, wildcards_only=True):
+                    if child.allow is not None and (best is None or child.allow[0] < best[0]):
+                        best = child.allow
+        limit = best[0] if best else float('inf')
+        for node in nodes:
+            children = node.children() if kind is None else node.kind_children(kind)
+            if any(child.best_below < limit for child in children):
+                return (False, None)
+        return (True, best[1] if best else None)
+
+    def match_targets(self, segments: Sequence[Segment]) -> List[Any]:
+        """ Allowing rules whose target (see RuleItem.target_size) matches all of the given segments. """
+        nodes = [self.root]
+        for segment in segments:
+            nodes = [child for node in nodes for child in node.step(segment)]
+            if not nodes:
+                return []
+        # rules with a trailing "{*}" or "[*]" end one node below their target
+        candidates = nodes + [child for node in nodes for child in (node.any_key, node.any_index) if child is not None]
+        return [node.allow[1] for node in candidates if node.allow is not None and node.allow[1].target_size == len(segments)]
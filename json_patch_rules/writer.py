@@ -0,0 +1,111 @@
+import copy
+from typing import Any, Callable, Dict, Optional, Tuple
+from json_patch_rules.paths import Segment, fits, get_in, new_container, put
+
+Recorder = Callable[[str, Tuple[Segment, ...], Any], None]
+
+
+class DocumentWriter:
+    """
+    Assigns values into a document by segments. With copy_on_write the containers along
+    every modified path are shallow copied once, and untouched subtrees stay shared with
+    the original document.
+
+    recorder, when given, is called with ("add" or "replace", segments, value) for every
+    assignment, in an order that rebuilds the same document (see operations.apply_ops).
+    """
+
+    def __init__(self, root: Any, copy_on_write: bool = False, recorder: Optional[Recorder] = None) -> None:
+        self.root = root
+        self.copy_on_write = copy_on_write
+        self.recorder = recorder
+        # keeps copies alive, so their ids can't be reused by other objects
+        self.owned: Dict[int, Any] = {}
+
+    def own(self, container: Any) -> Any:
+        if not self.copy_on_write or id(container) in self.owned:
+            return container
+        container = copy.copy(container)
+        self.owned[id(container)] = container
+        return container
+
+    def new(self, segment: Segment) -> Any:
+        container = new_container(segment)
+        self.owned[id(container)] = container
+        return container
+
+    def record(self, parent: Any, segments: Tuple[Segment, ...], value: Any) -> None:
+        """ Records the assignment of value at segments, parent being the container that receives it. """
+        segment = segments[-1]
+        if isinstance(parent, dict):
+            self.recorder('replace' if segment in parent else 'add', segments, value)
+            return
+        for index in range(len(parent), segment):
+            # put pads arrays with None up to the assigned index
+            self.recorder('add', segments[:-1] + (index,), None)
+        self.recorder('replace' if segment < len(parent) else 'add', segments, value)
+
+    def set(self, segments: Tuple[Segment, ...], value: Any) -> None:
+        recorder = self.recorder
+        if not segments:
+            if recorder is not None:
+                recorder('replace', (), value)
+            self.root = value
+            return
+
+        if fits(self.root, segments[0]):
+            self.root = self.own(self.root)
+        else:
+            self.root = self.new(segments[0])
+            if recorder is not None:
+                recorder('replace', (), new_container(segments[0]))
+        parent = self.root
+        for position, (segment, next_segment) in enumerate(zip(segments, segments[1:]), 1):
+            child = get_in(parent, (segment,))
+            if fits(child, next_segment):
+                child = self.own(child)
+            else:
+                child = self.new(next_segment)
+                if recorder is not None:
+                    self.record(parent, segments[:position], new_container(next_segment))
+            put(parent, segment, child)
+            parent = child
+        if recorder is not None:
+            self.record(parent, segments, value)
+        put(parent, segments[-1], value)
+
+    def set_borrowed(self, segments: Tuple[Segment, ...], value: Any) -> None:
+        """
+        Same as set for a value owned by someone else (e.g. a subtree of new data), which must
+        never be mutated. With copy_on_write it is shared and copied before any change like
+        every container not owned, otherwise it is deep copied first.
+        """
+        if not self.copy_on_write and isinstance(value, (dict, list)):
+            value = copy.deepcopy(value)
+        self.set(segments, value)
+
+    def get_container(self, segments: Tuple[Segment, ...]) -> Any:
+        """ Returns the container at segments ready to be mutated (copied first with copy_on_write). """
+        value = get_in(self.root, segments)
+        owned = self.own(value)
+        if owned is not value:
+            recorder, self.recorder = self.recorder, None
+            self.set(segments, owned)
+            self.recorder = recorder
+        return owned
+
+    def get_list(self, segments: Tuple[Segment, ...]) -> Optional[list]:
+        """ Returns the list at segments ready to be mutated, or None if it isn't a list. """
+        if not isinstance(get_in(self.root, segments), list):
+            return None
+        return self.get_container(segments)
+
+    def append(self, segments: Tuple[Segment, ...], value: Any) -> bool:
+        """ Appends value to the list at segments, returns False if there is no list there. """
+        target_value = self.get_list(segments)
+        if target_value is None:
+            return False
+        if self.recorder is not None:
+            self.recorder('add', segments + ('-',), value)
+        target_value.append(value)
+        return True
@@ -0,0 +1,46 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from json_patch_rules import patch_rules
+
+
+def test_apply_async_matches_apply():
+    rules = ["user.name", "user.contacts[*].label", "!user.permissions", "tags[*]|unique"]
+    patch = patch_rules(rules)
+    old_data = {"user": {"name": "old", "contacts": [{"label": "a"}]}, "tags": ["a"]}
+    new_data = {
+        "user": {"name": "new", "permissions": {"edit": True}, "contacts": [{"label": str(i), "n": i} for i in range(50)]},
+        "tags": ["a", "b", "b"],
+    }
+    expected = patch.apply(old_data, new_data)
+    assert asyncio.run(patch.apply_async(old_data, new_data, pause_every=3)) == expected
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert asyncio.run(patch.apply_async(old_data, new_data, executor=executor, offload_threshold=10)) == expected
+
+def test_apply_async_yields_to_the_event_loop():
+    patch = patch_rules(["[*]"])
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(1)
+            await asyncio.sleep(0)
+
+    async def main():
+        task = asyncio.ensure_future(ticker())
+        await asyncio.sleep(0)
+        result = await patch.apply_async([], list(range(1000)), pause_every=100)
+        task.cancel()
+        return result
+
+    assert asyncio.run(main()).data == list(range(1000))
+    assert len(ticks) >= 10
+
+def test_apply_many_async_keeps_order():
+    patch = patch_rules(["user.name"])
+    pairs = [({}, {"user": {"name": f"new {i}", "age": i}}) for i in range(20)]
+
+    async def main():
+        return [result async for result in patch.apply_many_async(pairs, concurrency=3, pause_every=1)]
+
+    results = asyncio.run(main())
+    assert [result.data for result in results] == [{"user": {"name": f"new {i}"}} for i in range(20)]
@@ -0,0 +1,17 @@
+import json
+from benchmarks import generators
+from benchmarks.run import all_cases, compare, run
+from json_patch_rules import patch_rules
+
+
+def test_generated_rules_decide_user_document():
+    patch = patch_rules(generators.mixed_rules(20))
+    result = patch.apply({}, generators.user_document(3))
+    assert result.denied_paths == ["user.permissions.edit", "user.permissions.delete", "user.contacts[0].type", "user.contacts[1].type", "user.contacts[1].number", "user.contacts[2].type", "user.contacts[2].number"]
+
+def test_run_writes_comparable_results():
+    results = run(all_cases(quick=True), repeat=1, min_time=0, pattern="init")
+    results = json.loads(json.dumps(results))
+    assert [timing["name"] for timing in results["timings"]] == ["rules=10", "rules=100"]
+    assert all(timing["best"] > 0 for timing in results["timings"])
+    assert len(compare(results, results)) == 2
@@ -0,0 +1,79 @@
+import json
+import os
+import stat
+import pytest
+from json_patch_rules import MappedDocument, RawJson, mapped, patch_rules
+
+
+def test_view_parses_only_paths_of_new_data(tmp_path):
+    path = tmp_path / "old.json"
+    path.write_text('{"meta": {"name": "x", "v": 1},\n "items": [{"id": 1, "s": "] } \\" ["}, {"id": 2}],\n "tags": ["a"]}\n')
+    with MappedDocument(str(path)) as document:
+        view = document.view({"meta": {"name": "y"}, "tags": "b"})
+        assert view["meta"] == {"name": "x", "v": 1}
+        assert isinstance(view["items"], RawJson) and isinstance(view["tags"], list)
+        assert view["items"].value() == [{"id": 1, "s": "] } \" ["}, {"id": 2}]
+        # arrays replaced by a leaf are kept as unparsed items, unique rules may append to them
+        assert isinstance(view["tags"][0], RawJson) and view["tags"] == ["a"]
+
+def test_apply_file_splices_untouched_values(tmp_path):
+    old_data = {"meta": {"name": "x", "v": 1}, "items": [{"id": i, "s": "[{"} for i in range(3)], "tags": ["a", "b"]}
+    source = tmp_path / "old.json"
+    source.write_text(json.dumps(old_data, indent=2))
+    output = tmp_path / "new.json"
+    patch = patch_rules(["meta.name", "tags|unique", "!items"])
+    new_data = {"meta": {"name": "y"}, "items": [], "tags": ["b", "c"], "other": 1}
+
+    result = patch.apply_file(str(source), new_data, output=str(output))
+    expected = patch.apply(old_data, new_data)
+    assert json.loads(output.read_text()) == expected.data
+    assert (result.successed_paths, result.denied_paths) == (expected.successed_paths, expected.denied_paths)
+    assert result.data is None
+    # untouched values keep their original formatting
+    assert json.dumps(old_data["items"], indent=2).replace("\n", "\n  ") in output.read_text()
+
+    os.chmod(source, 0o644)
+    patch.apply_file(str(source), new_data)
+    assert json.loads(source.read_text()) == expected.data
+    assert stat.S_IMODE(os.stat(source).st_mode) == 0o644
+
+
+@pytest.mark.parametrize("scan_size", [1, 3, 16])
+def test_value_end_across_scan_chunks(tmp_path, monkeypatch, scan_size):
+    monkeypatch.setattr(mapped, "MIN_SCAN_SIZE", scan_size)
+    monkeypatch.setattr(mapped, "MAX_SCAN_SIZE", scan_size * 4)
+    values = [
+        {"s": "] } \\\" [", "t": ["\\", "{{{{[[[[" * 8, {}], "u": [[[]]]},
+        ["\\\\\"]", {"k\\": "\\\\"}, "x" * 40],
+        [[{"a": [1, "]"]}], 2.5, None],
+    ]
+    parts = [json.dumps(value).encode() for value in values]
+    path = tmp_path / "old.json"
+    path.write_bytes(b"[" + b", ".join(parts) + b"]")
+    with MappedDocument(str(path)) as document:
+        start = 1
+        for part in parts:
+            assert document.value_end(start) == start + len(part)
+            start += len(part) + 2
+        assert document.value_end(0) == start - 1
+
+
+def test_value_end_scans_brackets_of_one_chunk_only(tmp_path, monkeypatch):
+    scanned = []
+    pattern = mapped.BRACKET_PATTERN
+
+    class Brackets:
+        def finditer(self, buffer, start, end):
+            scanned.append(end - start)
+            return pattern.finditer(buffer, start, end)
+
+    monkeypatch.setattr(mapped, "BRACKET_PATTERN", Brackets())
+    items = [{"id": i, "s": "[{\\\"", "t": [1, {"q": "]"}]} for i in range(100000)]
+    path = tmp_path / "old.json"
+    path.write_text(json.dumps({"items": items, "meta": {}}))
+    with MappedDocument(str(path)) as document:
+        view = document.view({"meta": {"name": "x"}})
+        assert isinstance(view["items"], RawJson) and view["meta"] == {}
+    # a few MB of brackets are counted in bulk, only the chunk closing the array is walked
+    assert path.stat().st_size > mapped.MAX_SCAN_SIZE
+    assert sum(scanned) <= 2 * mapped.MIN_SCAN_SIZE
@@ -1,4 +1,9 @@
-from json_patch_rules import patch_rules
+import json
+import pickle
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pytest
+from json_patch_rules import Action, JsonPatchRules, RuleItem, StatsCollector, apply_ops, compile_rules, load_rules, patch_rules
 
 def test_replace_at_root_level():
     rules = ["*|replace"]
@@ -269,4 +274,501 @@ def test_nested_unique_rule_on_array_of_strings():
     result = patch.apply(old_data, new_data)
     assert result.data["nested"]["items"] == ['a', 'b', 'c', 'd', 'e', 'f'], "Should apply unique rule and remove duplicates"
     assert result.denied_paths == []
-    assert result.successed_paths == ['nested.items[0]', 'nested.items[1]', 'nested.items[2]', 'nested.items[3]', 'nested.items[4]']
\ No newline at end of file
+    assert result.successed_paths == ['nested.items[0]', 'nested.items[1]', 'nested.items[2]', 'nested.items[3]', 'nested.items[4]']
+
+def test_verify_permission_any_key_wildcard():
+    patch = patch_rules(["user.{*}.label", "!user.name"])
+    new_data = {"user": {}}
+    assert patch.verify_permission("user.home.label", new_data)[0]
+    assert patch.verify_permission("user.home.label.nested", new_data)[0]
+    assert not patch.verify_permission("user.home.number", new_data)[0]
+    assert not patch.verify_permission("user.name", new_data)[0]
+
+def test_verify_permission_first_allowing_rule_wins():
+    rules = ["user.contacts[*]|replace", "user.contacts|unique"]
+    patch = patch_rules(rules)
+    is_allowed, rule_item, data_path = patch.verify_permission("user.contacts[3].label", {"user": {}})
+    assert is_allowed
+    assert rule_item.current_rule == "user.contacts[*]|replace"
+    assert data_path == "user.contacts[3].label"
+
+def test_verify_permission_exact_index():
+    patch = patch_rules(["user.contacts[0].label"])
+    assert patch.verify_permission("user.contacts[0].label", {})[0]
+    assert not patch.verify_permission("user.contacts[1].label", {})[0]
+
+def test_keys_with_dots_are_set_structurally():
+    rules = ["{*}"]
+    patch = patch_rules(rules)
+    old_data = {"example.com": {"visits": 1}}
+    new_data = {"example.com": {"visits": 2}}
+    result = patch.apply(old_data, new_data)
+    assert result.data == {"example.com": {"visits": 2}}, "Should not split keys containing dots"
+    assert result.successed_paths == ["example.com.visits"]
+
+def test_replace_target_under_any_index():
+    rules = ["user.contacts[*].label|replace"]
+    patch = patch_rules(rules)
+    old_data = {"user": {"contacts": [{"label": {"a": 1}}, {"label": "keep"}]}}
+    new_data = {"user": {"contacts": [{"label": {"b": 2}}]}}
+    result = patch.apply(old_data, new_data)
+    assert result.data == {"user": {"contacts": [{"label": {"b": 2}}, {"label": "keep"}]}}
+
+def test_copy_on_write_shares_untouched_subtrees():
+    rules = ["user.name"]
+    patch = patch_rules(rules)
+    old_data = {"user": {"name": "old"}, "history": [{"event": "created"}]}
+    new_data = {"user": {"name": "new"}}
+    result = patch.apply(old_data, new_data, copy="cow")
+    assert result.copy_mode == "cow"
+    assert result.data == {"user": {"name": "new"}, "history": [{"event": "created"}]}
+    assert result.data["history"] is old_data["history"], "Untouched subtrees should be shared"
+    assert old_data["user"]["name"] == "old", "Old data must not be modified"
+
+def test_copy_on_write_unique_does_not_modify_old_data():
+    rules = ["tags[*]|unique"]
+    patch = patch_rules(rules)
+    old_data = {"tags": ["a"]}
+    result = patch.apply(old_data, {"tags": ["a", "b", "b"]}, copy="cow")
+    assert result.data == {"tags": ["a", "b"]}
+    assert old_data == {"tags": ["a"]}
+
+def test_apply_in_place():
+    rules = ["user.name"]
+    patch = patch_rules(rules)
+    old_data = {"user": {"name": "old", "age": 20}}
+    result = patch.apply(old_data, {"user": {"name": "new"}}, in_place=True)
+    assert result.copy_mode == "in_place"
+    assert result.data is old_data
+    assert old_data == {"user": {"name": "new", "age": 20}}
+
+def test_deep_copy_is_the_default():
+    patch = patch_rules(["user.name"])
+    old_data = {"user": {"name": "old"}, "other": {}}
+    result = patch.apply(old_data, {"user": {"name": "new"}})
+    assert result.copy_mode == "deep"
+    assert result.data["other"] is not old_data["other"]
+
+def test_apply_many():
+    rules = ["user.name", "!user.age"]
+    patch = patch_rules(rules)
+    pairs = [({"user": {"name": f"old {i}"}}, {"user": {"name": f"new {i}", "age": i}}) for i in range(5)]
+    results = list(patch.apply_many(pairs))
+    assert [result.data["user"]["name"] for result in results] == [f"new {i}" for i in range(5)]
+    assert all(result.denied_paths == ["user.age"] for result in results)
+
+def test_apply_many_bounds_shared_decisions(monkeypatch):
+    patch = patch_rules(["{*}"])
+    seen = []
+    apply = patch.apply
+
+    def spy(old_data, new_data, decisions=None, **options):
+        seen.append(decisions)
+        return apply(old_data, new_data, decisions=decisions, **options)
+
+    monkeypatch.setattr(patch, "apply", spy)
+    pairs = [({}, {f"key {i}": i}) for i in range(10)]
+    assert len(list(patch.apply_many(pairs, chunk_size=3))) == 10
+    assert len({id(decisions) for decisions in seen}) == 4
+    assert max(len(decisions) for decisions in seen) <= 3
+
+def test_apply_many_with_executors():
+    rules = ["[*]|unique"]
+    patch = patch_rules(rules)
+    pairs = [(["a", "b"], ["b", "c", str(i)]) for i in range(7)]
+    expected = [patch.apply(old_data, new_data).data for old_data, new_data in pairs]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert [r.data for r in patch.apply_many(pairs, executor=executor, chunk_size=2)] == expected
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert [r.data for r in patch.apply_many(pairs, executor=executor, chunk_size=3)] == expected
+
+def test_patch_rules_pickle():
+    patch = pickle.loads(pickle.dumps(patch_rules(["user.contacts[*].label"])))
+    result = patch.apply({}, {"user": {"contacts": [{"label": "a", "phone": "b"}]}})
+    assert result.data == {"user": {"contacts": [{"label": "a"}]}}
+
+def test_decision_cache_stats():
+    patch = patch_rules(["user.name"], cache_size=2)
+    patch.apply({}, {"user": {"name": "a", "age": 1}})
+    patch.apply({}, {"user": {"name": "b", "age": 2}})
+    stats = patch.cache_stats()
+    assert (stats.hits, stats.misses, stats.size) == (2, 2, 2)
+    patch.apply({}, {"user": {"email": "c"}})
+    assert patch.cache_stats().evictions == 1
+
+def test_decision_cache_normalized_indices():
+    patch = patch_rules(["tags[*].name", "users[*].emails[0].address"], normalize_indices=True)
+    tags = [{"name": "a"}, {"name": "b"}, {"name": "c"}]
+    new_data = {"tags": tags, "users": [{"emails": [{"address": "x"}]}, {"emails": [{}, {"address": "y"}]}]}
+    result = patch.apply({}, new_data)
+    assert result.data == {"tags": tags, "users": [{"emails": [{"address": "x"}]}]}
+    assert result.denied_paths == ["users[1].emails[1].address"]
+    stats = patch.cache_stats()
+    # users[1].emails[1] is denied as a whole, without looking up its leaves
+    assert (stats.hits, stats.misses) == (2, 2)
+
+def test_decision_cache_disabled():
+    patch = patch_rules(["user.name"], cache_size=0)
+    assert patch.apply({}, {"user": {"name": "a"}}).data == {"user": {"name": "a"}}
+    assert patch.cache_stats() is None
+
+def test_to_unique_keeps_order_of_unhashable_values():
+    patch = patch_rules([])
+    items = [{"a": 1, "b": 2}, ["x"], {"b": 2, "a": 1}, "x", ["x"], 1, True, {"a": [1]}, {"a": [1]}]
+    assert patch.to_unique(items) == [{"a": 1, "b": 2}, ["x"], "x", 1, {"a": [1]}]
+
+def test_unique_rule_on_array_of_objects():
+    rules = ["tags|replace|unique"]
+    patch = patch_rules(rules)
+    old_data = {"tags": []}
+    new_data = {"tags": [{"id": 1, "n": "a"}, {"n": "a", "id": 1}, {"id": 2}]}
+    result = patch.apply(old_data, new_data)
+    assert result.data == {"tags": [{"id": 1, "n": "a"}, {"id": 2}]}, "Should remove duplicated objects"
+    assert len(new_data["tags"]) == 3, "New data must not be modified"
+
+def test_unique_rule_on_large_array():
+    patch = patch_rules(["[*]|unique"])
+    new_data = [f"tag-{i % 5000}" for i in range(20000)]
+    result = patch.apply([], new_data)
+    assert result.data == [f"tag-{i}" for i in range(5000)]
+
+def test_denied_subtree_reported_by_prefix():
+    rules = ["user.name", "!user.history"]
+    patch = patch_rules(rules)
+    new_data = {"user": {"name": "new", "history": [{"event": i} for i in range(3)]}}
+    result = patch.apply({}, new_data)
+    assert result.denied_paths == ["user.history[0].event", "user.history[1].event", "user.history[2].event"]
+    result = patch.apply({}, new_data, report_paths="prefix")
+    assert result.data == {"user": {"name": "new"}}
+    assert result.denied_paths == ["user.history"]
+    assert result.successed_paths == ["user.name"]
+
+def test_replaced_subtree_reported_by_prefix():
+    rules = ["user.contacts|replace", "user.name"]
+    patch = patch_rules(rules)
+    old_data = {"user": {"name": "old", "contacts": [{"label": "a"}, {"label": "b"}]}}
+    new_data = {"user": {"contacts": [{"label": "c", "phone": "1"}], "name": "new"}}
+    result = patch.apply(old_data, new_data, report_paths="prefix")
+    assert result.data == {"user": {"name": "new", "contacts": [{"label": "c", "phone": "1"}]}}
+    assert result.successed_paths == ["user.contacts", "user.name"]
+    result = patch.apply(old_data, new_data)
+    assert result.successed_paths == ["user.contacts[0].label", "user.contacts[0].phone", "user.name"]
+
+def test_prefix_decisions_of_rule_trie():
+    patch = patch_rules(["user.contacts[*].label", "user.settings", "!user.permissions"])
+    assert patch.trie.lookup_prefix(("user",)) == (False, None)
+    assert patch.trie.lookup_prefix(("user", "contacts", 0)) == (False, None)
+    assert patch.trie.lookup_prefix(("user", "permissions")) == (True, None)
+    is_decided, rule = patch.trie.lookup_prefix(("user", "settings", "theme"))
+    assert is_decided and rule.current_rule == "user.settings"
+
+def test_compiled_rules_round_trip(monkeypatch):
+    rules = ["!user.permissions", "user.contacts[*].label|replace", "tags[*]|unique", "{*}"]
+    artifact = compile_rules(rules)
+
+    def parse_rule(self, rule):
+        raise AssertionError("Compiled rules must not be parsed again")
+
+    monkeypatch.setattr(JsonPatchRules, "parse_rule", parse_rule)
+    patch = load_rules(artifact, cache_size=0)
+    assert len(patch.rules) == len(rules)
+    monkeypatch.undo()
+
+    expected = patch_rules(rules)
+    assert patch.content_hash == expected.content_hash
+    assert patch.rules == expected.rules
+    new_data = {"user": {"permissions": {"edit": True}, "contacts": [{"label": "a"}]}, "tags": ["a", "a"]}
+    assert patch.apply({}, new_data) == expected.apply({}, new_data)
+    assert patch.rules[1].pattern.match("user.contacts[3].label")
+
+def test_compiled_rule_paths_are_valid_regexes():
+    artifact = json.loads(compile_rules(["{*}.contacts[*].*.label", "user.{label,phone}"]))
+    for record in artifact["records"]:
+        re.compile(record[4])
+    patch = load_rules(artifact)
+    assert patch.rules[0].pattern.match("user.contacts[0].home.label")
+    assert not patch.rules[0].pattern.match("user.contacts[0].home.labels")
+    assert patch.rules[1].pattern.match("user.phone")
+
+def test_rule_item_keeps_its_original_arguments():
+    # actions, current_rule, path, deny, pattern, parent_path like the original dataclass
+    rule = RuleItem({"set"}, "user.name", r"^user\.name", False, None, "user.name")
+    assert (rule.path, rule.parent_path) == (r"^user\.name", "user.name")
+    rule = RuleItem({"set"}, "user.name", pattern=re.compile(r"^user\.name"), parent_path="user.name")
+    assert rule.path == r"^user\.name" and rule.pattern.match("user.name")
+
+def test_compiled_rules_are_validated():
+    artifact = patch_rules(["user.name"]).to_compiled()
+    artifact["rules"] = ["user.email"]
+    with pytest.raises(ValueError):
+        load_rules(artifact)
+    with pytest.raises(ValueError):
+        load_rules(b'{"format": "something else"}')
+    artifact = json.loads(compile_rules(["user.name"]))
+    artifact["records"][0][5] = []
+    with pytest.raises(ValueError):
+        load_rules(artifact)
+    assert patch_rules(["a", "b"]).content_hash != patch_rules(["b", "a"]).content_hash
+
+def test_rule_actions_as_flags():
+    patch = patch_rules(["tags|replace|unique", "user.name", "user.age|string"])
+    assert patch.rules[0].flags == Action.REPLACE | Action.UNIQUE
+    assert patch.rules[1].flags == Action.SET
+    assert patch.rules[2].flags == 0 and patch.rules[2].actions == {"string"}
+    assert not hasattr(patch.rules[0], "__dict__")
+
+def test_denied_paths_share_one_rule():
+    patch = patch_rules(["user.name"], cache_size=0)
+    _, first, _ = patch.verify_permission("user.age", {})
+    _, second, _ = patch.verify_permission("user.email", {})
+    assert first is second and not first.actions
+
+def test_compact_path_formats():
+    patch = patch_rules(["user.name", "user.contacts[*].label"])
+    new_data = {"user": {"name": "new", "age": 1, "contacts": [{"label": "a"}]}}
+    result = patch.apply({}, new_data, path_format="segments")
+    assert result.successed_paths == [("user", "name"), ("user", "contacts", 0, "label")]
+    assert result.denied_paths == [("user", "age")]
+    result = patch.apply({}, new_data, path_format="count")
+    assert (result.successed_paths, result.denied_paths) == ([], [])
+    assert (result.successed_count, result.denied_count) == (2, 1)
+    assert result.data == {"user": {"name": "new", "contacts": [{"label": "a"}]}}
+
+def test_observer_receives_apply_stats():
+    collected = []
+
+    class Observer:
+        def on_apply(self, stats):
+            collected.append(stats)
+
+    patch = patch_rules(["user.name", "!user.history"], observer=Observer())
+    old_data = {"user": {"name": "old"}, "other": {"a": [1]}}
+    patch.apply(old_data, {"user": {"name": "new", "age": 1, "history": [1, 2, 3]}})
+    patch.apply(old_data, {"user": {"name": "new"}}, copy="cow")
+    deep, cow = collected
+    assert (deep.copy_mode, deep.decisions, deep.prefix_checks) == ("deep", 2, 2)
+    assert (deep.allowed_paths, deep.denied_paths) == (1, 4)
+    assert deep.objects_copied == 4 and deep.bytes_copied > 0
+    assert cow.objects_copied == 2, "Only the root and user should be copied"
+    assert deep.total_time >= deep.traverse_time >= 0
+
+def test_stats_collector_sums_applies():
+    collector = StatsCollector()
+    patch = patch_rules(["user.name"])
+    patch.apply({}, {"user": {"name": "a"}})
+    patch.observer = collector
+    patch.apply({}, {"user": {"name": "a"}})
+    patch.apply({}, {"user": {"name": "b", "age": 1}})
+    snapshot = collector.snapshot()
+    assert (snapshot["applies"], snapshot["allowed_paths"], snapshot["denied_paths"]) == (2, 2, 1)
+    assert snapshot["total_time"] >= snapshot["max_total_time"] > 0
+    collector.reset()
+    assert collector.snapshot()["applies"] == 0
+
+def test_diff_skips_unchanged_values():
+    collector = StatsCollector()
+    patch = patch_rules(["user.name", "user.contacts[*].label", "!user.permissions"], observer=collector)
+    old_data = {"user": {"name": "old", "permissions": {"edit": True}, "contacts": [{"label": "a"}, {"label": "b"}]}}
+    new_data = {"user": {"name": "old", "permissions": {"edit": True}, "contacts": [{"label": "a"}, {"label": "c"}]}}
+    result = patch.apply(old_data, new_data, diff=True)
+    assert result.data == new_data
+    assert result.successed_paths == ["user.contacts[1].label"]
+    assert result.denied_paths == [] and result.unchanged_paths == []
+    assert collector.snapshot()["decisions"] == 1
+
+    result = patch.apply(old_data, new_data, diff=True, report_unchanged=True)
+    assert result.unchanged_paths == ["user.name", "user.permissions.edit", "user.contacts[0].label"]
+    result = patch.apply(old_data, new_data, diff=True, report_unchanged=True, report_paths="prefix")
+    assert result.unchanged_paths == ["user.name", "user.permissions", "user.contacts[0]"]
+
+def test_diff_detects_type_changes_and_replaced_removals():
+    patch = patch_rules(["flags.{*}", "contacts|replace"])
+    old_data = {"flags": {"a": 1, "b": 2.0}, "contacts": [{"id": 1}, {"id": 2}]}
+    new_data = {"flags": {"a": True, "b": 2}, "contacts": [{"id": 1}]}
+    result = patch.apply(old_data, new_data, diff=True)
+    assert result.data == {"flags": {"a": True, "b": 2}, "contacts": [{"id": 1}]}
+    assert type(result.data["flags"]["b"]) is int
+    assert result.successed_paths == ["flags.a", "flags.b"]
+
+def test_emit_ops_replays_to_the_result():
+    patch = patch_rules(["user.name", "user.contacts|replace", "user.tags|unique", "a/b.~c"])
+    old_data = {"user": {"name": "old", "contacts": [{"id": 1}, {"id": 2}], "tags": ["x"]}}
+    new_data = {"user": {"name": "new", "contacts": [{"id": 3}], "tags": ["x", "y"]}, "a/b": {"~c": 1}}
+    for copy in ("deep", "cow"):
+        result = patch.apply(old_data, new_data, copy=copy, emit_ops=True)
+        assert result.operations == [
+            {"op": "replace", "path": "/user/name", "value": "new"},
+            {"op": "replace", "path": "/user/contacts", "value": [{"id": 3}]},
+            {"op": "add", "path": "/user/tags/-", "value": "x"},
+            {"op": "add", "path": "/user/tags/-", "value": "y"},
+            {"op": "add", "path": "/a~1b", "value": {}},
+            {"op": "add", "path": "/a~1b/~0c", "value": 1},
+            {"op": "replace", "path": "/user/tags", "value": ["x", "y"]},
+        ]
+        assert apply_ops(old_data, result.operations) == result.data
+        assert old_data["user"]["tags"] == ["x"]
+    assert patch.apply(old_data, new_data).operations is None
+    assert patch.apply_stream(old_data, '{"user": {"name": "new"}}', emit_ops=True).operations == [
+        {"op": "replace", "path": "/user/name", "value": "new"},
+    ]
+
+def test_apply_ops_errors():
+    assert apply_ops({"a": [1, 3]}, [{"op": "add", "path": "/a/1", "value": 2}, {"op": "remove", "path": "/a/0"}]) == {"a": [2, 3]}
+    with pytest.raises(ValueError):
+        apply_ops({}, [{"op": "move", "from": "/a", "path": "/b"}])
+    with pytest.raises(ValueError):
+        apply_ops({"a": []}, [{"op": "replace", "path": "/a/0", "value": 1}])
+    with pytest.raises(ValueError):
+        apply_ops({}, [{"op": "add", "path": "/a/b", "value": 1}])
+
+def test_check_reports_like_apply_without_patching():
+    patch = patch_rules(["user.name", "user.contacts|replace", "!user.contacts[0]"])
+    new_data = {"user": {"name": "new", "role": "admin", "contacts": [{"id": 1}], "tags": ["a", "b"]}}
+    for report_paths in ("leaf", "prefix"):
+        result = patch.check(new_data, report_paths=report_paths)
+        applied = patch.apply({}, new_data, report_paths=report_paths)
+        assert (result.denied_paths, result.successed_paths) == (applied.denied_paths, applied.successed_paths)
+        assert result.data is None and result.copy_mode == "none"
+        assert not result.allowed
+
+    result = patch.check(new_data, fail_fast=True)
+    assert (result.successed_paths, result.denied_paths) == (["user.name"], ["user.role"])
+    assert patch.check({"user": {"name": "x"}}, fail_fast=True).allowed
+    assert not patch_rules([]).check([]).allowed
+
+def test_analyze_rules():
+    rules = ["user.name", "user.{*}", "user.name", "user.email|replace", "!user.password", "!admin", "a.{*}", "a.*.x", "b[0]"]
+    patch = patch_rules(rules)
+    analysis = patch.analyze()
+    assert [(issue.kind, issue.rule, issue.related) for issue in analysis.issues] == [
+        ("duplicate", "user.name", "user.name"),
+        ("shadowed", "user.email|replace", "user.{*}"),
+        ("conflict", "!user.password", "user.{*}"),
+        ("redundant_deny", "!admin", None),
+    ]
+    # "a.{*}" only matches keys of a, "a.*.x" also matches a[0].x
+    assert analysis.minimized == ["user.name", "user.{*}", "a.{*}", "a.*.x", "b[0]"]
+    assert patch_rules(["a.*", "a.{*}.x"]).analyze().minimized == ["a.*"]
+
+    minimized = patch_rules(analysis.minimized)
+    new_data = {"user": {"name": "x", "email": "y", "password": "z"}, "admin": True, "a": {"k": {"x": 1}}, "b": [1, 2]}
+    assert minimized.apply({}, new_data) == patch.apply({}, new_data)
+    assert patch_rules(["*|replace", "user", "[0].x"]).analyze().minimized == ["*|replace"]
+
+def test_alternation_rules():
+    patch = patch_rules(["user.contacts[0].{label,phone}", "foo.{key1, key2}.last", "bar.{key1}.b"])
+    new_data = {
+        "user": {"contacts": [{"label": "a", "phone": "1", "email": "x"}, {"label": "b"}]},
+        "foo": {"key1": {"last": 1}, "key2": {"last": 2}, "key3": {"last": 3}},
+        "bar": {"key1": {"b": 1}},
+    }
+    result = patch.apply({}, new_data)
+    assert result.successed_paths == ["user.contacts[0].label", "user.contacts[0].phone", "foo.key1.last", "foo.key2.last", "bar.key1.b"]
+    assert result.denied_paths == ["user.contacts[0].email", "user.contacts[1].label", "foo.key3.last"]
+    assert patch.rules[1].pattern.match("foo.key2.last.x") and not patch.rules[1].pattern.match("foo.key3.last")
+
+def test_rule_complexity_limits():
+    with pytest.raises(ValueError):
+        patch_rules([".".join(["a"] * 65)])
+    with pytest.raises(ValueError):
+        patch_rules([".".join(["{a,b}"] * 9)])
+    with pytest.raises(ValueError):
+        patch_rules(["a.{b,}"])
+    assert patch_rules([".".join(["{a,b}"] * 8)]).verify_permission("b.a.b.a.b.a.b.a", {})[0]
+
+def test_apply_parallel_matches_apply():
+    patch = patch_rules(["[*].price", "[*].tags|unique", "!items", "[2].name|replace"])
+    old_data = [{"price": i, "tags": ["a"], "name": "old"} for i in range(5)]
+    new_data = [{"price": i + 1, "tags": ["a", "b", "b"], "name": "new"} for i in range(9)]
+    expected = patch.apply(old_data, new_data)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        for copy in ("deep", "cow"):
+            result = patch.apply_parallel(old_data, new_data, executor=executor, chunk_size=2, copy=copy)
+            assert result.data == expected.data
+            assert (result.denied_paths, result.successed_paths) == (expected.denied_paths, expected.successed_paths)
+        result = patch.apply_parallel(old_data, new_data, executor=executor, chunk_size=2, path_format="count")
+        assert (result.denied_count, result.successed_count) == (expected.denied_count, expected.successed_count)
+    assert old_data[0] == {"price": 0, "tags": ["a"], "name": "old"}
+
+    patch = patch_rules(["*|replace"])
+    assert patch.apply_parallel(old_data, new_data, chunk_size=2) == patch.apply(old_data, new_data)
+
+    patch = patch_rules(["{*}.price", "!{*}.name"])
+    old_data = {f"k{i}": {"price": 0, "name": "old"} for i in range(4)}
+    new_data = {f"k{i}": {"price": i, "name": "new"} for i in range(10)}
+    expected = patch.apply(old_data, new_data)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = patch.apply_parallel(old_data, new_data, executor=executor, chunk_size=2)
+    assert result.data == expected.data
+    assert (result.denied_paths, result.successed_paths) == (expected.denied_paths, expected.successed_paths)
+
+def test_apply_parallel_reports_one_apply_to_the_observer():
+    collector = StatsCollector()
+    patch = patch_rules(["[*].price", "!items"], observer=collector)
+    new_data = [{"price": i, "name": "x"} for i in range(10)]
+    for executor in (ThreadPoolExecutor(max_workers=2), ProcessPoolExecutor(max_workers=2)):
+        collector.reset()
+        with executor:
+            result = patch.apply_parallel([], new_data, executor=executor, chunk_size=2)
+        snapshot = collector.snapshot()
+        assert snapshot["applies"] == 1
+        assert (snapshot["allowed_paths"], snapshot["denied_paths"]) == (result.successed_count, result.denied_count) == (10, 10)
+        assert snapshot["decisions"] + snapshot["prefix_checks"] > 0
+    assert patch.observer is collector
+
+def test_bounded_path_reports():
+    patch = patch_rules(["items[*].price", "name"])
+    new_data = {"items": [{"price": i, "id": i} for i in range(50)], "name": "x", "extra": [1, 2]}
+    result = patch.apply({}, new_data, path_format="groups")
+    assert result.successed_paths == {"items[*].price": 50, "name": 1}
+    assert result.denied_paths == {"items[*].id": 50, "extra[*]": 2}
+    assert (result.successed_count, result.denied_count) == (51, 52)
+
+    result = patch.apply({}, new_data, max_paths=3)
+    assert result.successed_paths == ["items[0].price", "items[1].price", "items[2].price"]
+    assert (result.successed_count, result.denied_count, len(result.denied_paths)) == (51, 52, 3)
+    assert patch.apply({}, new_data, path_format="groups", max_paths=1).denied_paths == {"items[*].id": 50}
+
+    expected = patch.apply({}, new_data)
+    paths = list(patch.iter_paths(new_data))
+    assert [path for path, is_allowed in paths if is_allowed] == expected.successed_paths
+    assert [path for path, is_allowed in paths if not is_allowed] == expected.denied_paths
+
+@pytest.mark.parametrize("rule, new_data, allowed", [
+    ("user", {"user": {"name": "x"}}, True),
+    ("user", {"username": "x"}, False),
+    ("user.name", {"user": {"name": "x"}}, True),
+    ("user.name", {"user": {"names": "x"}}, False),
+    ("{*}.name", {"a": {"name": "x"}}, True),
+    ("{*}.name", {"a": {"b": {"name": "x"}}}, False),
+    ("user.*.name", {"user": {"a": {"name": "x"}}}, True),
+    ("user.*.name", {"user": [{"name": "x"}]}, True),
+    ("user.*.name", {"user": {"a": {"b": {"name": "x"}}}}, False),
+    ("user.{*}", {"user": {"name": "x"}}, True),
+    ("user.{*}", {"user": "x"}, False),
+    ("user.{*}", {"user": ["x"]}, False),
+    ("user[*]", {"user": ["x"]}, True),
+    ("user[*]", {"user": "x"}, False),
+    ("user[*]", {"user": {"name": "x"}}, False),
+])
+def test_rules_match_whole_segments(rule, new_data, allowed):
+    result = patch_rules([rule]).apply({}, new_data)
+    assert (result.data == new_data) == allowed
+    assert bool(result.successed_paths) == allowed and bool(result.denied_paths) != allowed
+
+@pytest.mark.parametrize("options", [{}, {"in_place": True}, {"copy": "cow"}])
+def test_replaced_values_are_not_shared_with_new_data(options):
+    patch = patch_rules(["contacts[*].tags|unique", "contacts|replace"])
+    new_data = {"contacts": [{"name": "x", "tags": ["a"]}]}
+    result = patch.apply({"contacts": []}, new_data, **options)
+    assert result.data == {"contacts": [{"name": "x", "tags": ["a"]}]}
+    assert new_data == {"contacts": [{"name": "x", "tags": ["a"]}]}
+
+def test_trailing_wildcard_rules_target_their_parent():
+    patch = patch_rules(["contacts[*]|replace", "tags[*]|unique"])
+    old_data = {"contacts": ["a", "b"], "tags": ["x"]}
+    result = patch.apply(old_data, {"contacts": ["c"], "tags": ["x", "y"]})
+    assert result.data == {"contacts": ["c"], "tags": ["x", "y"]}
+    assert patch.apply(old_data, {"contacts": ["a"]}, diff=True).data["contacts"] == ["a"]
+    assert patch.apply(old_data, {"contacts": "c"}).denied_paths == ["contacts"]
+
@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+from json_patch_rules import RuleRegistry, StatsCollector, patch_rules, shared_patch_rules
+
+
+def test_equal_rule_lists_share_one_instance():
+    registry = RuleRegistry()
+    patch = registry.get(["user.name", "!user.age"])
+    assert registry.get(["user.name", "!user.age"]) is patch
+    assert registry.get(["user.name", "!user.age"], cache_size=0) is not patch
+    assert registry.get(["!user.age", "user.name"]) is not patch
+    stats = registry.stats()
+    assert (stats.hits, stats.misses, stats.size) == (1, 3, 3)
+    assert patch.apply({}, {"user": {"name": "a", "age": 1}}) == patch_rules(["user.name", "!user.age"]).apply({}, {"user": {"name": "a", "age": 1}})
+
+def test_rule_items_are_shared_across_rule_sets():
+    registry = RuleRegistry()
+    admin = registry.get(["user.name", "user.email", "user.roles"])
+    member = registry.get(["user.name", "user.email"])
+    assert member.rules[0] is admin.rules[0]
+    assert member.rules[1] is admin.rules[1]
+    assert registry.stats().shared_rules == 3
+
+def test_least_recently_used_rule_sets_are_evicted():
+    registry = RuleRegistry(max_size=2)
+    first = registry.get(["a"])
+    registry.get(["b"])
+    registry.get(["a"])
+    registry.get(["c"])
+    assert registry.stats().evictions == 1
+    assert registry.get(["a"]) is first
+    assert registry.stats().misses == 3
+
+    registry = RuleRegistry(max_rules=3)
+    registry.get(["a", "b"])
+    registry.get(["c", "d"])
+    stats = registry.stats()
+    assert (stats.size, stats.rules, stats.evictions) == (1, 2, 1)
+
+def test_concurrent_lookups_compile_once():
+    registry = RuleRegistry()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        patches = list(executor.map(lambda _: registry.get(["user.contacts[*].label"]), range(50)))
+    assert all(patch is patches[0] for patch in patches)
+    assert registry.stats().misses == 1
+
+def test_default_options_and_observer_share_one_instance():
+    registry = RuleRegistry()
+    patch = registry.get(["user.name"])
+    assert registry.get(["user.name"], cache_size=1024, normalize_indices=False) is patch
+    collector = StatsCollector()
+    handle = registry.get(["user.name"], observer=collector)
+    assert handle.observer is collector and handle.trie is patch.trie
+    assert patch.observer is None and registry.get(["user.name"]) is patch
+    assert registry.stats().misses == 1
+    patch.apply({}, {"user": {"name": "a"}})
+    handle.apply({}, {"user": {"name": "b"}})
+    assert collector.applies == 1
+
+    collector = StatsCollector()
+    shared = shared_patch_rules(["user.email"], observer=collector)
+    shared.apply({}, {"user": {"email": "a"}})
+    assert collector.applies == 1
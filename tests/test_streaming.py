@@ -0,0 +1,64 @@
+import io
+import json
+import pytest
+from json_patch_rules import patch_rules
+from json_patch_rules.streaming import basic_parse
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+def test_basic_parse_events_across_chunks():
+    text = json.dumps({"name": "José \"J\"", "values": [1, -2.5e3, True, None]}).encode()
+    events = list(basic_parse(chunked(text, 1)))
+    assert events == [
+        ("start_map", None),
+        ("map_key", "name"),
+        ("value", "José \"J\""),
+        ("map_key", "values"),
+        ("start_array", None),
+        ("value", 1),
+        ("value", -2500.0),
+        ("value", True),
+        ("value", None),
+        ("end_array", None),
+        ("end_map", None),
+    ]
+
+@pytest.mark.parametrize("text", [
+    '{"a":1', '[1, [2]', '', '{"a" 1}', '[1 2]', '[1,,2]', '{"a":1,}', '[1,]', '{1: 2}', '{"a":1} {"b":2}', '1 2', ']',
+])
+def test_basic_parse_rejects_malformed_json(text):
+    with pytest.raises(ValueError):
+        list(basic_parse(chunked(text.encode(), 2)))
+
+def test_apply_stream_rejects_truncated_json():
+    patch = patch_rules(["{*}"])
+    with pytest.raises(ValueError):
+        patch.apply_stream({}, '{"a": 1, "b": [2, 3', backend="python")
+    with pytest.raises(ValueError):
+        patch.apply_stream({}, '{"a": 1} {"b": 2}', backend="python")
+
+def test_apply_stream_matches_apply():
+    rules = ["user.name", "user.contacts[*].label", "!user.permissions"]
+    patch = patch_rules(rules)
+    old_data = {"user": {"name": "old", "contacts": [{"label": "a", "number": "1"}]}}
+    new_data = {"user": {"name": "new", "permissions": {"admin": True}, "contacts": [{"label": "b", "number": "2"}]}}
+    expected = patch.apply(old_data, new_data)
+    result = patch.apply_stream(old_data, chunked(json.dumps(new_data).encode(), 7))
+    assert result.data == expected.data
+    assert result.denied_paths == expected.denied_paths
+    assert result.successed_paths == expected.successed_paths
+
+def test_apply_stream_replace_and_unique():
+    rules = ["user.contacts|replace", "tags[*]|unique"]
+    patch = patch_rules(rules)
+    old_data = {"user": {"contacts": ["a", "b"]}, "tags": ["x"]}
+    new_data = '{"user": {"contacts": [{"label": "c"}]}, "tags": ["x", "y", "y"]}'
+    result = patch.apply_stream(old_data, io.StringIO(new_data), backend="python")
+    assert result.data == {"user": {"contacts": [{"label": "c"}]}, "tags": ["x", "y"]}
+
+def test_apply_stream_replace_at_root_level():
+    patch = patch_rules(["*|replace"])
+    result = patch.apply_stream({"user": {"name": "old"}}, b"{}")
+    assert result.data == {}